@@ -0,0 +1,590 @@
+"""
+prct2sai 性能测试脚本（离线运行，不需要打开界面）
+
+用法:
+    python benchmark.py extract [笔刷文件.brushset ...]
+    python benchmark.py resolve [笔刷文件.brushset ...]
+    python benchmark.py suite [--brushsets 4 --brushes 8 --images 24 --size 1024] [--output 结果.json]
+    python benchmark.py startup [--repeat 5]
+    python benchmark.py bmp [--repeat 20]
+
+extract / resolve 不指定文件时默认使用 公开笔刷_供范例测试/ 下的范例笔刷；
+suite 自动生成合成笔刷和图片文件夹，输出 JSON，方便发布前对比各阶段的吞吐量；
+startup 在新进程中用 -X importtime 测量程序的启动（导入）耗时，同样输出 JSON。
+bmp 逐字节核对 save_bmp 与 Pillow 写出的灰度 BMP，并对比两者的速度，有不一致时返回 1。
+每一轮都在临时目录中运行，不会污染程序目录下的 cache/ 与 texture_shape/；
+白底判断的缓存也关闭，重复运行测到的仍是真正的判断，而不是缓存命中。
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import plistlib
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zipfile
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，改用 GetProcessMemoryInfo
+    resource = None
+
+from PIL import Image, ImageDraw
+import PIL
+
+import prct2sai_v7 as prct2sai
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DIR = os.path.join(BASE_DIR, '公开笔刷_供范例测试')
+
+
+def default_brushsets():
+    return sorted(glob.glob(os.path.join(SAMPLE_DIR, '*.brushset')))
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    """
+    切换到一个临时工作目录（解析器使用相对路径 cache/ 与 texture_shape/），
+    关闭白底判断的缓存（每次都真正判断，也不写程序目录下的缓存），并屏蔽被测函数的 print 输出。
+    """
+    old_cwd = os.getcwd()
+    old_verdicts = prct2sai.invert_verdicts
+    tmp = tempfile.mkdtemp(prefix='prct2sai_bench_')
+    try:
+        os.chdir(tmp)
+        prct2sai.set_verdict_cache(None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield tmp
+    finally:
+        prct2sai.invert_verdicts = old_verdicts
+        os.chdir(old_cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def best_time(func, repeat):
+    """
+    运行 repeat 次，返回最短耗时（秒）。
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def time_call(func, repeat):
+    """
+    每次都在新的临时目录中运行 repeat 次，返回最短耗时（秒），不计临时目录的创建和清理。
+    """
+    best = None
+    for _ in range(repeat):
+        with scratch_dir():
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+############################################################
+#        1) BrushsetParser.parse：流式提取 vs 解码重编码
+############################################################
+
+def bench_extract_modes(brushsets, repeat=3):
+    """
+    对比 BrushsetParser 的 stream 与 decode 两种提取模式。
+    """
+    results = {}
+    # decode 放在前面，方便和历史数据对照
+    for mode in ('decode', 'stream'):
+        def run():
+            for filename in brushsets:
+                prct2sai.BrushsetParser(filename, extract_mode=mode).parse()
+        results[mode] = time_call(run, repeat)
+
+    print(f"笔刷文件数: {len(brushsets)}，每种模式取 {repeat} 次中的最短耗时")
+    for mode, elapsed in results.items():
+        print(f"  {mode:<8} {elapsed:.3f}s")
+    if results.get('stream'):
+        print(f"  加速比: {results['decode'] / results['stream']:.2f}x")
+    return results
+
+
+############################################################
+#        2) resolve_uids：递归展开 vs 带缓存的迭代展开
+############################################################
+
+def legacy_resolve_uids(objects, obj):
+    """
+    旧版递归实现，仅用于对照。
+    """
+    if isinstance(obj, plistlib.UID):
+        return legacy_resolve_uids(objects, objects[obj.data])
+    elif isinstance(obj, dict):
+        return {k: legacy_resolve_uids(objects, v) for k, v in sorted(obj.items())}
+    elif isinstance(obj, list):
+        return [legacy_resolve_uids(objects, item) for item in obj]
+    elif isinstance(obj, bytes):
+        return obj.hex()
+    else:
+        return obj
+
+
+def load_archives(brushsets):
+    """
+    读取所有笔刷中的 Brush.archive，返回 $objects 列表。
+    """
+    archives = []
+    for filename in brushsets:
+        with zipfile.ZipFile(filename) as archive:
+            for member in archive.namelist():
+                if prct2sai.is_brush_archive(member):
+                    with archive.open(member) as f:
+                        archives.append(plistlib.load(f).get('$objects', []))
+    return archives
+
+
+def bench_resolve(brushsets, repeat=20):
+    """
+    对比新旧两种 UID 展开方式在范例 Brush.archive 上的耗时。
+    """
+    archives = load_archives(brushsets)
+    parser = prct2sai.BrushsetParser.__new__(prct2sai.BrushsetParser)
+    implementations = {
+        'legacy': legacy_resolve_uids,
+        'memoized': parser.resolve_uids,
+    }
+
+    results = {}
+    for name, resolve in implementations.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for objects in archives:
+                resolve(objects, objects[1])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+
+    print(f"Brush.archive 数量: {len(archives)}，取 {repeat} 次中的最短耗时")
+    for name, elapsed in results.items():
+        print(f"  {name:<9} {elapsed * 1000:.2f}ms")
+    if results['memoized']:
+        print(f"  加速比: {results['legacy'] / results['memoized']:.2f}x")
+    return results
+
+
+############################################################
+#        3) 合成数据上的全流程基准（输出 JSON）
+############################################################
+
+MEGABYTE = 1024 * 1024
+
+def make_texture(size, rng, white_background=False):
+    """
+    生成一张灰度笔刷材质：随机椭圆 + 少量噪点，压缩率接近真实材质。
+    """
+    width, height = size
+    background, ink = (255, 0) if white_background else (0, 255)
+    img = Image.new('L', size, background)
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(3, 8)):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        rx, ry = rng.randint(width // 16, width // 4), rng.randint(height // 16, height // 4)
+        draw.ellipse((x0 - rx, y0 - ry, x0 + rx, y0 + ry), fill=rng.randint(ink // 2, ink) if ink else 0)
+    noise = Image.frombytes('L', size, rng.randbytes(width * height))
+    return Image.blend(img, noise, 0.1)
+
+def make_brush_archive(name, rng):
+    """
+    生成最小的 NSKeyedArchiver 格式 Brush.archive，结构与 Procreate 导出的一致（含压感曲线等嵌套对象）。
+    """
+    uid = plistlib.UID
+    objects = ['$null', None, name,
+               {'$classname': 'SilicaBrush', '$classes': ['SilicaBrush', 'NSObject']},
+               {'$classname': 'NSMutableArray', '$classes': ['NSMutableArray', 'NSArray', 'NSObject']},
+               {'$classname': 'ValkyrieMagnitudinalCurve', '$classes': ['ValkyrieMagnitudinalCurve', 'NSObject']}]
+    brush = {'$class': uid(3), 'name': uid(2), 'bundledShapePath': uid(0), 'bundledGrainPath': uid(0),
+             'plotSpacing': rng.random(), 'plotJitter': rng.random() / 4,
+             'dynamicsJitterSize': rng.random(), 'shapeScatter': rng.random(),
+             'shapeRotation': rng.choice([0.0, 1.0]), 'shapeRoundness': 1.0}
+    for curve_name in ('Size', 'Opacity', 'Bleed', 'Hue', 'Saturation', 'Brightness'):
+        points = [uid(len(objects) + i) for i in range(4)]
+        objects.extend(f'{{{i / 3:.3f}, {i / 3:.3f}}}' for i in range(4))
+        objects.append({'$class': uid(4), 'NS.objects': points})
+        objects.append({'$class': uid(5), 'points': uid(len(objects) - 1)})
+        brush[f'dynamicsPressure{curve_name}Curve'] = uid(len(objects) - 1)
+        brush[f'dynamicsPressure{curve_name}'] = rng.random()
+    objects[1] = brush
+    return plistlib.dumps({'$archiver': 'NSKeyedArchiver', '$version': 100000,
+                           '$top': {'root': uid(1)}, '$objects': objects},
+                          fmt=plistlib.FMT_BINARY)
+
+def encode_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def make_brushset(path, brushes, size, rng):
+    """
+    生成合成 .brushset：每个笔刷一个 Brush.archive + Shape.png，隔一个笔刷再带一张 Grain.png。
+    返回其中的材质数量。
+    """
+    textures = 0
+    with zipfile.ZipFile(path, 'w') as archive:
+        for idx in range(brushes):
+            brush_dir = str(uuid.UUID(int=rng.getrandbits(128))).upper()
+            archive.writestr(f'{brush_dir}/Brush.archive',
+                             make_brush_archive(f'brush {idx}', rng), zipfile.ZIP_DEFLATED)
+            archive.writestr(f'{brush_dir}/Shape.png',
+                             encode_png(make_texture((size, size), rng, idx % 2 == 0)))
+            textures += 1
+            if idx % 2:
+                archive.writestr(f'{brush_dir}/Grain.png', encode_png(make_texture((size, size), rng)))
+                textures += 1
+    return textures
+
+def make_texture_folder(folder, count, size, rng):
+    """
+    生成 count 张 PNG，其中每四张有一张不是正方形；返回文件路径列表。
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for idx in range(count):
+        texture_size = (size, size * 3 // 4) if idx % 4 == 3 else (size, size)
+        path = os.path.join(folder, f'texture_{idx:03d}.png')
+        make_texture(texture_size, rng, idx % 2 == 0).save(path)
+        paths.append(path)
+    return paths
+
+def peak_rss_mb():
+    """
+    当前进程到目前为止的峰值常驻内存（MB），不支持的平台返回 None。
+    Linux 读 /proc 的 VmHWM，Windows 读 PeakWorkingSetSize，其余平台用 ru_maxrss。
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+        if not get_info(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / MEGABYTE, 1)
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+def run_stage(setup, args, repeat, workdir):
+    """
+    在独立的子进程中执行：setup(*args) 做好输入（读取文件等）并返回被测函数，
+    运行 repeat 次取最短耗时。返回 (最短耗时, 子进程峰值内存, 本阶段新增的峰值内存)，
+    新增部分以导入完成、准备输入之前的峰值为基线，因此包含该阶段需要的输入数据。
+    """
+    os.chdir(workdir)
+    # 关闭白底判断的缓存，每一轮都真正判断
+    prct2sai.set_verdict_cache(None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        baseline = peak_rss_mb()
+        best = best_time(setup(*args), repeat)
+    peak = peak_rss_mb()
+    stage_peak = round(peak - baseline, 1) if peak is not None and baseline is not None else None
+    return best, peak, stage_peak
+
+def measure(setup, args, images, nbytes, repeat=1):
+    """
+    每个阶段单独起一个子进程运行（spawn，各平台行为一致），峰值内存互不影响；
+    换算成每秒处理的图片数和 MB 数。peak_rss_mb 是子进程的总峰值，
+    stage_peak_mb 扣除了解释器和模块导入的部分。
+    """
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        best, peak, stage_peak = pool.submit(run_stage, setup, args, repeat, os.getcwd()).result()
+    return {
+        'seconds': round(best, 4),
+        'images': images,
+        'megabytes': round(nbytes / MEGABYTE, 3),
+        'images_per_s': round(images / best, 2) if best else None,
+        'mb_per_s': round(nbytes / MEGABYTE / best, 2) if best else None,
+        'peak_rss_mb': peak,
+        'stage_peak_mb': stage_peak,
+    }
+
+def file_bytes(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+def load_gray_images(paths):
+    gray_images = []
+    for path in paths:
+        with Image.open(path) as img:
+            gray_images.append(img.convert('L'))
+    return gray_images
+
+# 以下 stage_* 在子进程中调用：准备输入，返回被测函数（必须是模块级函数才能传给 spawn 子进程）
+def stage_parse(brushsets):
+    return lambda: [prct2sai.BrushsetParser(f, force=True).parse() for f in brushsets]
+
+def stage_resolve_uids(brushsets):
+    archives = load_archives(brushsets)
+    return lambda: [prct2sai.BrushsetParser.resolve_uids(objects, objects[1]) for objects in archives]
+
+def stage_convert_png_to_bmp(source_dir, target_dir, jobs):
+    return lambda: prct2sai.convert_png_to_bmp(source_dir, target_dir, jobs=jobs)
+
+def stage_should_invert_image(image_paths):
+    gray_images = load_gray_images(image_paths)
+    return lambda: [prct2sai.should_invert_image(img) for img in gray_images]
+
+def stage_invert_image(image_paths):
+    gray_images = load_gray_images(image_paths)
+    return lambda: [prct2sai.invert_image(img) for img in gray_images]
+
+def stage_invert_image_files(image_paths):
+    return lambda: prct2sai.invert_image_files(image_paths, auto_detect=True)
+
+def stage_compress_images(image_paths, target_size, jobs):
+    return lambda: prct2sai.compress_images(image_paths, target_size, jobs=jobs)
+
+def stage_process_crop(image_paths, crop_size, jobs):
+    return lambda: prct2sai.process_crop(image_paths, (0.5, 0.5), crop_size, jobs=jobs)
+
+def bench_suite(brushset_count=4, brushes=8, images=24, size=1024, repeat=1, jobs=None, seed=0):
+    """
+    在临时目录中生成合成数据，依次测量各个热点阶段，返回可直接写成 JSON 的结果。
+    resolve 阶段的 images 为 Brush.archive 个数，should_invert 的 MB 按像素字节计。
+    """
+    rng = random.Random(seed)
+    stages = {}
+    with scratch_dir() as tmp:
+        brushset_dir = os.path.join(tmp, 'brushsets')
+        os.makedirs(brushset_dir)
+        brushsets = []
+        texture_count = 0
+        for idx in range(brushset_count):
+            path = os.path.join(brushset_dir, f'synthetic_{idx}.brushset')
+            texture_count += make_brushset(path, brushes, size, rng)
+            brushsets.append(path)
+        image_paths = make_texture_folder(os.path.join(tmp, 'textures'), images, size, rng)
+        pixel_bytes = sum(img.width * img.height for img in load_gray_images(image_paths))
+
+        stages['parse'] = measure(stage_parse, (brushsets,), texture_count, file_bytes(brushsets), repeat)
+
+        stages['resolve_uids'] = measure(
+            stage_resolve_uids, (brushsets,), len(load_archives(brushsets)),
+            file_bytes(glob.glob(os.path.join('cache', '*', '*', '*_resolved_params.json'))), repeat)
+
+        stages['convert_png_to_bmp'] = measure(
+            stage_convert_png_to_bmp, (os.path.dirname(image_paths[0]), os.path.join(tmp, 'bmp'), jobs),
+            len(image_paths), file_bytes(image_paths), repeat)
+
+        stages['should_invert_image'] = measure(
+            stage_should_invert_image, (image_paths,), len(image_paths), pixel_bytes, repeat)
+        stages['invert_image'] = measure(
+            stage_invert_image, (image_paths,), len(image_paths), pixel_bytes, repeat)
+        stages['invert_image_files'] = measure(
+            stage_invert_image_files, (image_paths,), len(image_paths), file_bytes(image_paths), repeat)
+
+        stages['compress_images'] = measure(
+            stage_compress_images, (image_paths, size // 2, jobs), len(image_paths), file_bytes(image_paths), repeat)
+
+        stages['process_crop'] = measure(
+            stage_process_crop, (image_paths, size // 2, jobs), len(image_paths), file_bytes(image_paths), repeat)
+
+    return {
+        'config': {'brushsets': brushset_count, 'brushes_per_set': brushes, 'images': images,
+                   'size': size, 'repeat': repeat, 'jobs': jobs, 'seed': seed},
+        'environment': {'python': platform.python_version(), 'pillow': PIL.__version__,
+                        'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'stages': stages,
+        'startup': bench_startup(repeat=3),
+    }
+
+
+############################################################
+#        4) 启动耗时：python -X importtime
+############################################################
+
+# 新进程中执行的代码：只导入 / 导入后加载界面模块 / 把延迟导入的模块全部立即导入（对照）
+STARTUP_CASES = {
+    'cli': "import prct2sai_v7",
+    'gui': "import prct2sai_v7; prct2sai_v7.load_gui_modules()",
+    'eager': "import prct2sai_v7, PIL.Image, zipfile, plistlib, json, concurrent.futures, multiprocessing",
+}
+
+def parse_importtime(stderr, top=10):
+    """
+    解析 -X importtime 的输出，返回 (所有模块自身耗时之和（秒）, 自身耗时最多的 top 个模块)。
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_part, cumulative_part, name = line.split('|', 2)
+        modules.append({'module': name.strip(),
+                        'self_ms': int(self_part.split(':')[1]) / 1000,
+                        'cumulative_ms': int(cumulative_part) / 1000})
+    total = sum(module['self_ms'] for module in modules) / 1000
+    slowest = sorted(modules, key=lambda module: module['self_ms'], reverse=True)[:top]
+    return total, slowest
+
+def run_startup_case(code, repeat):
+    """
+    在新进程中运行 code repeat 次，返回最短的总耗时和那一次的导入明细。
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              cwd=BASE_DIR, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}
+        if best is None or elapsed < best[0]:
+            best = (elapsed, proc.stderr)
+    import_seconds, slowest = parse_importtime(best[1])
+    return {'wall_s': round(best[0], 4), 'import_s': round(import_seconds, 4), 'slowest_imports': slowest}
+
+def bench_startup(repeat=5):
+    """
+    测量各启动方式的耗时，wall_over_baseline_s 扣除了解释器本身（python -c pass）的启动时间。
+    """
+    baseline = run_startup_case('pass', repeat)
+    cases = {}
+    for name, code in STARTUP_CASES.items():
+        result = run_startup_case(code, repeat)
+        if 'wall_s' in result and 'wall_s' in baseline:
+            result['wall_over_baseline_s'] = round(result['wall_s'] - baseline['wall_s'], 4)
+        cases[name] = result
+    return {'baseline_wall_s': baseline.get('wall_s'), 'repeat': repeat, 'cases': cases}
+
+
+############################################################
+#        5) 灰度 BMP：save_bmp vs Pillow 的 BMP 编码器
+############################################################
+
+# 标准尺寸之外也包含宽度不是 4 的倍数（需要行补齐）和 1 像素宽/高的情况
+BMP_CHECK_SIZES = [(256, 256), (512, 512), (1024, 1024), (1, 1), (3, 5), (255, 17), (257, 300),
+                   (1023, 2), (1810, 1254)]
+
+def bench_bmp_writer(repeat=20, seed=0):
+    """
+    每种尺寸生成一张随机灰度图，分别用 Pillow 和 save_bmp 写出并逐字节比较；
+    标准尺寸另外测量写出一张所用的最短时间。
+    """
+    rng = random.Random(seed)
+    results = []
+    mismatches = 0
+    with scratch_dir() as tmp:
+        for width, height in BMP_CHECK_SIZES:
+            img = Image.frombytes('L', (width, height), rng.randbytes(width * height))
+            pillow_path = os.path.join(tmp, 'pillow.bmp')
+            direct_path = os.path.join(tmp, 'direct.bmp')
+            img.save(pillow_path, 'BMP')
+            prct2sai.save_bmp(img, direct_path)
+            with open(pillow_path, 'rb') as f:
+                expected = f.read()
+            with open(direct_path, 'rb') as f:
+                identical = f.read() == expected
+            mismatches += not identical
+            entry = {'size': [width, height], 'bytes': len(expected), 'identical': identical}
+            if (width, height) in prct2sai.SUPPORTED_RESOLUTIONS:
+                entry['pillow_ms'] = round(best_time(lambda: img.save(pillow_path, 'BMP'), repeat) * 1000, 3)
+                entry['direct_ms'] = round(best_time(lambda: prct2sai.save_bmp(img, direct_path), repeat) * 1000, 3)
+            results.append(entry)
+    return {'repeat': repeat, 'mismatches': mismatches, 'sizes': results}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="prct2sai 性能测试")
+    sub = arg_parser.add_subparsers(dest='command', required=True)
+
+    extract = sub.add_parser('extract', help="对比笔刷解析的两种提取模式")
+    extract.add_argument('brushsets', nargs='*', help=".brushset 文件，默认使用范例笔刷")
+    extract.add_argument('--repeat', type=int, default=3)
+
+    resolve = sub.add_parser('resolve', help="对比 Brush.archive 的 UID 展开方式")
+    resolve.add_argument('brushsets', nargs='*', help=".brushset 文件，默认使用范例笔刷")
+    resolve.add_argument('--repeat', type=int, default=20)
+
+    suite = sub.add_parser('suite', help="在合成数据上测量全部热点阶段，输出 JSON")
+    suite.add_argument('--brushsets', type=int, default=4, help="合成 .brushset 数量")
+    suite.add_argument('--brushes', type=int, default=8, help="每个 .brushset 中的笔刷数量")
+    suite.add_argument('--images', type=int, default=24, help="图片文件夹中的图片数量")
+    suite.add_argument('--size', type=int, default=1024, help="合成材质的边长")
+    suite.add_argument('--repeat', type=int, default=1)
+    suite.add_argument('--jobs', type=int, default=None, help="convert_png_to_bmp / compress_images / process_crop 的线程数")
+    suite.add_argument('--seed', type=int, default=0)
+    suite.add_argument('--output', help="把结果写入此 JSON 文件（默认输出到屏幕）")
+
+    startup = sub.add_parser('startup', help="测量程序启动（导入模块）的耗时，输出 JSON")
+    startup.add_argument('--repeat', type=int, default=5)
+    startup.add_argument('--output', help="把结果写入此 JSON 文件（默认输出到屏幕）")
+
+    bmp = sub.add_parser('bmp', help="核对 save_bmp 与 Pillow 的输出是否逐字节相同并对比速度，输出 JSON")
+    bmp.add_argument('--repeat', type=int, default=20)
+    bmp.add_argument('--output', help="把结果写入此 JSON 文件（默认输出到屏幕）")
+
+    args = arg_parser.parse_args(argv)
+    if args.command in ('suite', 'startup', 'bmp'):
+        if args.command == 'suite':
+            report = bench_suite(args.brushsets, args.brushes, args.images, args.size,
+                                 args.repeat, args.jobs, args.seed)
+        elif args.command == 'startup':
+            report = bench_startup(args.repeat)
+        else:
+            report = bench_bmp_writer(args.repeat)
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+        return 1 if report.get('mismatches') else 0
+
+    brushsets = [os.path.abspath(f) for f in args.brushsets] or default_brushsets()
+    if not brushsets:
+        print("未找到任何 .brushset 文件。")
+        return 1
+
+    if args.command == 'extract':
+        bench_extract_modes(brushsets, args.repeat)
+    elif args.command == 'resolve':
+        bench_resolve(brushsets, args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
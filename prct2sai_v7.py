@@ -1,16 +1,47 @@
-import zipfile
 import os
-import plistlib
-import json
-import shutil
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from tkinter.ttk import Button, Label, Frame, Progressbar
-from PIL import Image
-import glob
+import zlib
+import io
+import logging
+import contextlib
+import importlib
 import sys
-from PIL.Image import Resampling
-from PIL.ImageTk import PhotoImage
+import types
+import threading
+import queue
+import time
+
+class _LazyModule:
+    """
+    模块占位：第一次用到时才真正导入，并把同名全局变量换成真正的模块，之后没有额外开销。
+    打包后的程序启动时不用先加载 PIL、zipfile、多进程等模块，窗口能马上出现。
+    """
+    def __init__(self, global_name, module_name=None):
+        self._global_name = global_name
+        self._module_name = module_name or global_name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._module_name)
+        globals()[self._global_name] = module
+        return getattr(module, attr)
+
+zipfile = _LazyModule('zipfile')
+plistlib = _LazyModule('plistlib')
+json = _LazyModule('json')
+shutil = _LazyModule('shutil')
+hashlib = _LazyModule('hashlib')
+struct = _LazyModule('struct')
+argparse = _LazyModule('argparse')
+glob = _LazyModule('glob')
+multiprocessing = _LazyModule('multiprocessing')
+concurrent_futures = _LazyModule('concurrent_futures', 'concurrent.futures')
+logging_handlers = _LazyModule('logging_handlers', 'logging.handlers')
+sqlite3 = _LazyModule('sqlite3')
+Image = _LazyModule('Image', 'PIL.Image')
+ImageTk = _LazyModule('ImageTk', 'PIL.ImageTk')
+
+# tkinter 相关模块由 load_gui_modules() 按需导入，命令行模式不加载界面
+tk = filedialog = messagebox = None
+Button = Label = Frame = Progressbar = None
 #    pyinstaller --windowed --icon=bitbug_favicon.ico prct2sai_v7.py
 ############################################################
 #           1) PNG -> BMP (含分辨率检查 & WRONGSIZE)
@@ -35,95 +66,347 @@ def get_nearest_standard_size(width, height):
     # 如果比256还小，返回None
     return None
 
-def convert_png_to_bmp(source_dir, target_dir):
+# SAI 笔刷材质支持的分辨率
+SUPPORTED_RESOLUTIONS = {(256, 256), (512, 512), (1024, 1024)}
+
+# 缩放质量 -> resize 的 reducing_gap
+#   fast / balanced：JPEG 解码时直接按 1/2、1/4、1/8 缩小，其他格式先按整数倍快速缩小，
+#                    最后再用 LANCZOS 精细缩放；gap 越小越快，细节损失也越多。
+#   best：始终解码原图并对原图做完整的 LANCZOS（旧版行为）。
+RESIZE_QUALITIES = {'fast': 2.0, 'balanced': 3.0, 'best': None}
+DEFAULT_RESIZE_QUALITY = 'balanced'
+
+def draft_for_size(img, size, quality=DEFAULT_RESIZE_QUALITY, mode=None):
     """
-    遍历指定目录下的所有图片文件，转换为BMP格式。
-    支持的格式：PNG, JPG, JPEG, TIFF, BMP, GIF, WebP 等
-    若分辨率 > 1024 则先缩放至 1024×1024；
-    若是正方形但不是标准分辨率，则缩放至下一级标准分辨率；
-    若分辨率不在 (256,256)|(512,512)|(1024,1024)，则移到 WRONGSIZE 文件夹。
+    在读取像素之前调用：JPEG 只解码到不小于 size 的分辨率，大图省内存也省时间。
+    其他格式不支持 draft，调用无效果。
     """
-    from PIL import Image, ImageFilter
-    from PIL.Image import Resampling
+    if RESIZE_QUALITIES[quality] is not None:
+        img.draft(mode, size)
 
-    # 支持的图片格式
-    SUPPORTED_FORMATS = {
-        '.png', '.jpg', '.jpeg', '.tiff', '.tif', 
-        '.bmp', '.gif', '.webp', '.psd', '.ico'
-    }
+def resize_image(img, size, quality=DEFAULT_RESIZE_QUALITY, box=None):
+    """
+    LANCZOS 缩放；fast / balanced 时先用 reduce() 按整数倍缩小再精细缩放。
+    box 为只参与缩放的源区域（其余部分直接丢弃）。
+    """
+    return img.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=RESIZE_QUALITIES[quality])
 
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
+def standard_target_size(size, max_size=1024):
+    """
+    stretch 模式（旧版行为）会把 size 缩放到多大，不需要缩放时返回 None。
+    """
+    width, height = size
+    if width > max_size or height > max_size:
+        return (max_size, max_size)
+    if width == height and size not in SUPPORTED_RESOLUTIONS:
+        return get_nearest_standard_size(width, height)
+    return None
 
-    wrong_size_dir = os.path.join(target_dir, 'WRONGSIZE')
-    if not os.path.exists(wrong_size_dir):
-        os.makedirs(wrong_size_dir)
+# 规范为标准分辨率的方式（都保持长宽比，空白处补黑色，即 SAI 中的透明）
+#   fit：等比缩小到整张图能放进的标准尺寸（取不超过长边的最大一级），再补边成正方形
+#   pad：不缩放（超过 max_size 时才等比缩小），补边到能放下整张图的最小标准尺寸
+#   crop：等比缩小到短边为标准尺寸，居中裁掉长边多出的部分
+#   stretch：旧版行为，超过 max_size 直接拉伸为正方形，非标准尺寸放入 WRONGSIZE
+NORMALIZE_MODES = ('fit', 'pad', 'crop', 'stretch')
+DEFAULT_NORMALIZE_MODE = 'fit'
+STANDARD_SIZES = (256, 512, 1024)
+
+def plan_normalization(size, max_size=1024, mode=DEFAULT_NORMALIZE_MODE):
+    """
+    只根据原图尺寸决定最终几何，可以在解码之前（只读了文件头时）调用。
+    返回 (源区域 box, 缩放后尺寸, 画布边长)；stretch 模式的画布边长为 None。
+    """
+    if mode not in NORMALIZE_MODES:
+        raise ValueError(f"未知的尺寸规范方式: {mode}")
+    width, height = size
+    if mode == 'stretch':
+        return (0, 0, width, height), standard_target_size(size, max_size) or size, None
+
+    sizes = [s for s in STANDARD_SIZES if s <= max_size] or [STANDARD_SIZES[0]]
+    edge = min(width, height) if mode == 'crop' else max(width, height)
+    if mode == 'pad':
+        side = next((s for s in sizes if s >= edge), sizes[-1])
+    else:
+        side = max((s for s in sizes if s <= edge), default=sizes[0])
+    # 只缩小不放大，比画布小的一边留给补边
+    scale = min(1.0, side / edge)
+
+    # 画布放不下的部分（crop）在缩放之前就裁掉，不参与重采样
+    box_width = min(width, side / scale)
+    box_height = min(height, side / scale)
+    left = (width - box_width) / 2
+    top = (height - box_height) / 2
+    box = (left, top, left + box_width, top + box_height)
+    resized = (max(1, round(box_width * scale)), max(1, round(box_height * scale)))
+    return box, resized, side
+
+def draft_for_normalization(img, max_size=1024, mode=DEFAULT_NORMALIZE_MODE,
+                            quality=DEFAULT_RESIZE_QUALITY, draft_mode=None):
+    """
+    读取像素之前调用：按 plan_normalization 的缩放比例让 JPEG 直接解码到较小的分辨率。
+    """
+    box, resized, _ = plan_normalization(img.size, max_size, mode)
+    scale_x = resized[0] / (box[2] - box[0])
+    scale_y = resized[1] / (box[3] - box[1])
+    if scale_x < 1 or scale_y < 1:
+        draft_for_size(img, (round(img.width * scale_x), round(img.height * scale_y)),
+                       quality, draft_mode)
+
+def normalize_image(img, file_label, max_size=1024, mode=DEFAULT_NORMALIZE_MODE,
+                    quality=DEFAULT_RESIZE_QUALITY):
+    """
+    按 mode 把图片一次性处理成最终尺寸（缩放、裁切、补边各最多一次）。
+    返回处理后的图片（可能就是传入的 img）。
+    """
+    original_size = img.size
+    box, resized, side = plan_normalization(img.size, max_size, mode)
+    if resized != img.size or box != (0, 0, img.width, img.height):
+        img = resize_image(img, resized, quality, box)
+    if side and img.size != (side, side):
+        canvas = Image.new(img.mode, (side, side), 0)
+        canvas.paste(img, ((side - img.width) // 2, (side - img.height) // 2))
+        img = canvas
+    if img.size != original_size:
+        logger.info(f"已将 {file_label} 从 {original_size} 规范为 {img.width}x{img.height}")
+    return img
+
+class MemoryBudget:
+    """
+    按估算的解码内存限制同时处理的图片数量，limit_bytes 为 None 时不限制。
+    单张图片就超出预算时也会放行（独占整个预算），不会卡死。
+    传入 Manager 的 Condition 与 Value 时可在多个进程间共享（见 shared()）。
+    """
+    def __init__(self, limit_bytes=None, condition=None, in_use=None):
+        self.limit_bytes = limit_bytes
+        self._condition = condition if condition is not None else threading.Condition()
+        self._in_use = in_use if in_use is not None else types.SimpleNamespace(value=0)
 
-    supported_resolutions = {(256, 256), (512, 512), (1024, 1024)}
+    def shared(self, manager):
+        """
+        返回可以传给子进程、额度与本预算相同的跨进程预算。
+        """
+        return MemoryBudget(self.limit_bytes, manager.Condition(), manager.Value('q', 0))
 
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            file_ext = os.path.splitext(file)[1].lower()
-            if file_ext in SUPPORTED_FORMATS:
-                file_path = os.path.join(root, file)
-                base_filename = os.path.splitext(file)[0]
-                
-                try:
-                    with Image.open(file_path) as img:
-                        # 如果是动图，只取第一帧
-                        if hasattr(img, 'is_animated') and img.is_animated:
-                            img.seek(0)
-                        
-                        # 转换为灰度图
-                        img = img.convert('L')
-                        original_size = img.size
-                        
-                        # 若超过 1024x1024，则先缩放
-                        if img.size[0] > 1024 or img.size[1] > 1024:
-                            img = img.resize((1024, 1024), Resampling.LANCZOS)
-                            print(f"已将 {file} 从 {original_size} 压缩至 1024x1024")
-                        # 若是正方形但不是标准分辨率，尝试缩放到下一级标准分辨率
-                        elif img.size[0] == img.size[1] and img.size not in supported_resolutions:
-                            nearest_size = get_nearest_standard_size(img.size[0], img.size[1])
-                            if nearest_size:
-                                img = img.resize(nearest_size, Resampling.LANCZOS)
-                                print(f"已将 {file} 从 {original_size} 压缩至 {nearest_size}")
-
-                        if img.size in supported_resolutions:
-                            target_file_path = os.path.join(target_dir, f"{base_filename}.bmp")
-                            img.save(target_file_path, 'BMP')
-                            print(f"已转换: {file} -> {os.path.basename(target_file_path)}")
-                        else:
-                            wrong_file_path = os.path.join(wrong_size_dir, f"WARNING_{base_filename}.bmp")
-                            img.save(wrong_file_path, 'BMP')
-                            print(f"不规范尺寸，已移至WRONGSIZE: {file}")
-                except Exception as e:
-                    print(f"处理文件 {file} 时出错: {str(e)}")
-                    continue
+    @contextlib.contextmanager
+    def reserve(self, nbytes):
+        if self.limit_bytes is None:
+            yield
+            return
+        nbytes = min(nbytes, self.limit_bytes)
+        with self._condition:
+            while self._in_use.value and self._in_use.value + nbytes > self.limit_bytes:
+                self._condition.wait(0.1)
+                raise_if_cancelled()
+            self._in_use.value += nbytes
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_use.value -= nbytes
+                self._condition.notify_all()
+
+# 默认的解码内存预算（MB），0 表示不限制；命令行可用 --memory-budget 修改
+DEFAULT_MEMORY_BUDGET_MB = 1024
+_memory_budget = MemoryBudget(DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024)
+
+def set_memory_budget(budget):
+    """
+    budget 为 MB 数（0 或 None 表示不限制），或者 MemoryBudget（进程池初始化时传入共享预算）。
+    """
+    global _memory_budget
+    if not isinstance(budget, MemoryBudget):
+        budget = MemoryBudget(budget * 1024 * 1024 if budget else None)
+    _memory_budget = budget
 
-    print(f"\n>>> 图片转换完成：{source_dir}")
-    print("    若有分辨率不在(256,512,1024)之列的图片，已移入 WRONGSIZE 子目录。")
+def estimate_decode_bytes(img, max_size=1024):
+    """
+    估算解码并规范一张图片时同时占用的内存：解码后的原图 + 灰度图 + 最终画布。
+    在 draft 之后、读取像素之前调用，此时 img.size 已是缩小解码后的尺寸。
+    """
+    try:
+        bands = Image.getmodebands(img.mode)
+    except (KeyError, ValueError):
+        bands = 4
+    width, height = img.size
+    return width * height * (bands + 1) + max_size * max_size
 
+# SAI 用的 8 位灰度 BMP：文件头 + 信息头 + 256 级灰度调色板 + 自下而上、每行补齐到 4 字节的像素。
+# 与 Pillow 的 BMP 编码器（默认 96 dpi）逐字节相同，但不经过通用编码器：
+# 调色板只生成一次，同尺寸的文件头只打包一次，像素由 tobytes 的 raw 编码器直接按 BMP 行序产出。
+GRAY_BMP_PALETTE = bytes(value for level in range(256) for value in (level, level, level, 0))
+BMP_PIXELS_PER_METER = int(96 * 39.3701 + 0.5)
+_gray_bmp_headers = {}
 
-def resize_bmp_images(folder_path):
+def gray_bmp_header(width, height):
     """
-    遍历指定文件夹中的所有.bmp文件，将分辨率超过1024×1024的图片再次压缩为1024×1024。
+    返回 width x height 的 8 位灰度 BMP 从文件开头到像素数据之前的全部字节（含调色板）。
     """
-    if not os.path.exists(folder_path):
-        print(f">>> 未找到 {folder_path} 文件夹，无需进一步压缩。")
+    header = _gray_bmp_headers.get((width, height))
+    if header is None:
+        stride = (width + 3) & ~3
+        offset = 14 + 40 + len(GRAY_BMP_PALETTE)
+        image_size = stride * height
+        header = (
+            struct.pack('<2sIII', b'BM', offset + image_size, 0, offset)
+            + struct.pack('<IIIHHIIIIII', 40, width, height, 1, 8, 0, image_size,
+                          BMP_PIXELS_PER_METER, BMP_PIXELS_PER_METER, 256, 256)
+            + GRAY_BMP_PALETTE
+        )
+        _gray_bmp_headers[(width, height)] = header
+    return header
+
+def save_bmp(img, path):
+    """
+    保存为 BMP。L 模式（转换出的材质都是）直接写出，其他模式交给 Pillow。
+    """
+    if img.mode != 'L':
+        img.save(path, 'BMP')
         return
+    width, height = img.size
+    # raw 编码器按 BMP 的行序（自下而上，orientation=-1）和补齐后的行宽一次产出像素，不再另外翻转、拼接
+    pixels = img.tobytes('raw', 'L', (width + 3) & ~3, -1)
+    with open(path, 'wb') as f:
+        f.write(gray_bmp_header(width, height))
+        f.write(pixels)
+
+# 转换为 BMP 时支持的图片格式
+SUPPORTED_FORMATS = {
+    '.png', '.jpg', '.jpeg', '.tiff', '.tif', 
+    '.bmp', '.gif', '.webp', '.psd', '.ico'
+}
+
+def convert_image_to_bmp(file_path, target_dir, wrong_size_dir, max_size=1024,
+                         quality=DEFAULT_RESIZE_QUALITY, normalize=DEFAULT_NORMALIZE_MODE):
+    """
+    把单个图片转换为灰度 BMP，标准尺寸写入 target_dir，其余写入 wrong_size_dir。
+    每张图只解码、缩放、编码各一次。
+    返回 'ok' / 'wrongsize' / 'error'。
+    """
+    file = os.path.basename(file_path)
+    base_filename = os.path.splitext(file)[0]
+    try:
+        with Image.open(file_path) as source:
+            # 如果是动图，只取第一帧
+            if hasattr(source, 'is_animated') and source.is_animated:
+                source.seek(0)
+            
+            # 大图只解码到需要的分辨率
+            draft_for_normalization(source, max_size, normalize, quality, 'L')
+
+            # 同时解码的图片受内存预算限制；原图、灰度图用完立即 close()，不和后面的副本同时占着内存
+            with _memory_budget.reserve(estimate_decode_bytes(source, max_size)):
+                # 转换为灰度图
+                with timed('decode', file_path):
+                    gray = source.convert('L')
+                source.close()
+                with timed('resize', file_path):
+                    img = normalize_image(gray, file, max_size, normalize, quality)
+                if img is not gray:
+                    gray.close()
 
-    target_resolution = (1024, 1024)
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith('.bmp'):
-            file_path = os.path.join(folder_path, filename)
-            with Image.open(file_path) as img:
-                if img.size[0] > 1024 or img.size[1] > 1024:
-                    resized_image = img.resize(target_resolution, Image.LANCZOS)
-                    resized_image.save(file_path, 'BMP')
-                    print(f"图像已缩放并保存：{file_path}")
-                else:
-                    print(f"图像分辨率未超过 1024x1024：{file_path}")
+                try:
+                    if img.size in SUPPORTED_RESOLUTIONS:
+                        target_file_path = os.path.join(target_dir, f"{base_filename}.bmp")
+                        with timed('encode', file_path):
+                            save_bmp(img, target_file_path)
+                        logger.info(f"已转换: {file} -> {os.path.basename(target_file_path)}")
+                        return 'ok'
+                    else:
+                        wrong_file_path = os.path.join(wrong_size_dir, f"WARNING_{base_filename}.bmp")
+                        with timed('encode', file_path):
+                            save_bmp(img, wrong_file_path)
+                        logger.info(f"不规范尺寸，已移至WRONGSIZE: {file}")
+                        return 'wrongsize'
+                finally:
+                    img.close()
+    except Exception as e:
+        logger.error(f"处理文件 {file} 时出错: {str(e)}")
+        return 'error'
+
+def converted_bmp_path(file_path, target_dir, status):
+    """
+    convert_image_to_bmp 为 file_path 写出的 BMP 路径（status 为它的返回值），出错时为 None。
+    """
+    base_filename = os.path.splitext(os.path.basename(file_path))[0]
+    if status == 'ok':
+        return os.path.join(target_dir, f"{base_filename}.bmp")
+    if status == 'wrongsize':
+        return os.path.join(target_dir, 'WRONGSIZE', f"WARNING_{base_filename}.bmp")
+    return None
+
+def collect_convertible_images(source_dir, exclude_dir=None):
+    """
+    收集 source_dir 下所有可转换的图片（跳过输出目录 exclude_dir），按路径排序。
+    输出文件名只取决于原文件名（不含扩展名），同名文件（包括同一文件夹中的 x.png 与 x.jpg）
+    只保留按文件名排序遍历时的最后一个，目录和文件都排序后再遍历，结果不随文件系统而变。
+    """
+    exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+    by_name = {}
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs
+                         if not exclude_dir or os.path.abspath(os.path.join(root, d)) != exclude_dir)
+        for file in sorted(files):
+            if os.path.splitext(file)[1].lower() in SUPPORTED_FORMATS:
+                base_filename = os.path.splitext(file)[0]
+                if base_filename in by_name:
+                    logger.warning(f"同名文件 {base_filename}，跳过 {by_name[base_filename]}，"
+                                   f"只转换: {os.path.join(root, file)}")
+                by_name[base_filename] = os.path.join(root, file)
+    return sorted(by_name.values())
+
+def convert_png_to_bmp(source_dir, target_dir, max_size=1024, jobs=None, progress_callback=None,
+                       quality=DEFAULT_RESIZE_QUALITY, normalize=DEFAULT_NORMALIZE_MODE, image_files=None):
+    """
+    遍历指定目录下的所有图片文件，转换为BMP格式。
+    支持的格式：PNG, JPG, JPEG, TIFF, BMP, GIF, WebP 等
+    按 normalize（见 NORMALIZE_MODES）规范为 (256,256)|(512,512)|(1024,1024)，边长不超过 max_size；
+    stretch 模式下仍不在标准尺寸之列的图片移到 WRONGSIZE 文件夹。
+    jobs 为同时转换的线程数（默认 CPU 核数，1 为逐个转换）；
+    Pillow 解码、缩放和编码时会释放 GIL，多线程即可用满多核。
+    quality 见 RESIZE_QUALITIES。
+    image_files 不为 None 时只转换这些文件（监视文件夹时只转换新放入的图片）。
+    返回 [(文件路径, 状态, 耗时秒数), ...]。
+    """
+    if not os.path.exists(target_dir):
+        os.makedirs(target_dir)
+
+    wrong_size_dir = os.path.join(target_dir, 'WRONGSIZE')
+    if not os.path.exists(wrong_size_dir):
+        os.makedirs(wrong_size_dir)
+
+    if image_files is None:
+        image_files = collect_convertible_images(source_dir, exclude_dir=target_dir)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    def convert_one(file_path):
+        raise_if_cancelled()
+        start = time.perf_counter()
+        status = convert_image_to_bmp(file_path, target_dir, wrong_size_dir, max_size, quality,
+                                      normalize)
+        return file_path, status, time.perf_counter() - start
+
+    results = []
+    with concurrent_futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(convert_one, file_path) for file_path in image_files]
+        try:
+            for future in futures:
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(len(results) / len(futures) * 100)
+        except JobCancelled:
+            for future in futures:
+                future.cancel()
+            raise
+
+    logger.info(f"\n>>> 图片转换完成：{source_dir}")
+    logger.info("    若有分辨率不在(256,512,1024)之列的图片，已移入 WRONGSIZE 子目录。")
+    if results:
+        total_time = sum(elapsed for _, _, elapsed in results)
+        logger.info(f"    共 {len(results)} 张，累计耗时 {total_time:.2f}s，最慢的文件：")
+        for file_path, status, elapsed in sorted(results, key=lambda r: r[2], reverse=True)[:5]:
+            logger.info(f"      {elapsed:.3f}s  {os.path.basename(file_path)} ({status})")
+    return results
 
 
 ############################################################
@@ -141,35 +424,173 @@ def find_bmp_files(source_dir):
                 bmp_files.append(os.path.join(root, file))
     return bmp_files
 
-def copy_ini_files(bmp_files, ini_source):
+class IniTemplate:
     """
-    为每个BMP文件复制并重命名INI文件到相应的文件夹，除非INI文件已存在。
-    需要在 ./defult/ 下存在 default.ini (或对应名称)。
+    default.ini 模板：只读取、解析一次，之后每个 INI 只替换数值再一次性写出。
+    BOM、换行符和注释都原样保留。
+    """
+    def __init__(self, path):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        self.default_bytes = text.encode('utf-8')
+        self.lines = text.splitlines(keepends=True)
+        self.value_lines = {}  # 键 -> (行号, "键 =" 部分, 模板中的值, 行尾换行符)
+        for idx, line in enumerate(self.lines):
+            stripped = line.strip()
+            if not stripped or stripped.startswith((';', '[')) or '=' not in stripped:
+                continue
+            body = line.rstrip('\r\n')
+            key_part, value = body.split('=', 1)
+            self.value_lines[key_part.strip()] = (idx, key_part + '=', value.strip(), line[len(body):])
+
+    def render(self, values=None):
+        """
+        返回替换了 values 中各键的 INI 内容（bytes）。模板里带正负号的值保持带符号的写法。
+        """
+        if not values:
+            return self.default_bytes
+        lines = list(self.lines)
+        for key, value in values.items():
+            entry = self.value_lines.get(key)
+            if entry is None:
+                continue
+            idx, prefix, original, newline = entry
+            if isinstance(value, int) and original.startswith(('+', '-')):
+                value = f"{value:+d}"
+            lines[idx] = f"{prefix} {value}{newline}"
+        return ''.join(lines).encode('utf-8')
+
+# 已解析的模板：路径 -> (修改时间, IniTemplate)，模板文件被修改后会重新读取
+_ini_templates = {}
+
+def load_ini_template(ini_path):
+    mtime = os.stat(ini_path).st_mtime_ns
+    cached = _ini_templates.get(ini_path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, IniTemplate(ini_path))
+        _ini_templates[ini_path] = cached
+    return cached[1]
+
+# Procreate 笔刷参数 -> SAI INI 键: (INI 键, Procreate 键, 换算, 取值范围)
+# Procreate 的滑块大多存为 0~1，按界面上的百分比线性对应到 SAI 的百分比；
+# 参数缺失时保留模板中的值。
+BRUSH_PARAM_MAPPING = [
+    ('Spacing', 'plotSpacing', lambda v: v * 100, (1, 1000)),
+    ('Scattering', 'plotJitter', lambda v: v * 100, (0, 1000)),
+    ('SizeJitter', 'dynamicsJitterSize', lambda v: v * 100, (0, 100)),
+    ('AngleJitter', 'shapeScatter', lambda v: v * 100, (0, 100)),
+    # Rotation 接近 100% 时形状跟随笔画方向，否则固定角度
+    ('AngleControl', 'shapeRotation', lambda v: 2 if abs(v) >= 0.5 else 0, (0, 2)),
+    # Count 在界面上是 1~16
+    ('Count', 'shapeCount', lambda v: 1 + v * 15, (1, 20)),
+    ('CountJitter', 'shapeCountJitter', lambda v: v * 100, (0, 100)),
+    ('HueJitter', 'dynamicsJitterHue', lambda v: v * 100, (0, 100)),
+    ('SaturationJitter', 'dynamicsJitterSaturation', lambda v: v * 100, (0, 100)),
+    ('BrightnessJitter', 'dynamicsJitterLightness', lambda v: v * 100, (0, 100)),
+]
+
+def map_brush_params(params):
+    """
+    把 *_resolved_params.json 的内容换算成 {INI 键: 值}。
+    """
+    values = {}
+    for ini_key, param_key, convert, (low, high) in BRUSH_PARAM_MAPPING:
+        value = params.get(param_key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        values[ini_key] = min(max(int(round(convert(value))), low), high)
+    roundness = params.get('shapeRoundness')
+    if isinstance(roundness, (int, float)) and not isinstance(roundness, bool):
+        values['WxHRatio'] = f"100:{min(max(int(round(roundness * 100)), 1), 100)}"
+    # 同一笔刷里逐个形状抖动颜色时，SAI 也按形状应用
+    if any(params.get(key) for key in ('dynamicsJitterHue', 'dynamicsJitterSaturation',
+                                       'dynamicsJitterLightness')):
+        values['ApplyToEachShape'] = 1
+    return values
+
+def load_resolved_params(texture_dir):
+    """
+    读取 cache/ 中与材质同目录的 *_resolved_params.json 并换算，没有时返回 None。
+    """
+    for params_path in sorted(glob.glob(os.path.join(glob.escape(texture_dir), '*_resolved_params.json'))):
+        try:
+            with open(params_path, 'r', encoding='utf-8') as f:
+                return map_brush_params(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error(f"无法读取笔刷参数 {params_path}: {e}")
+    return None
+
+# 复制到 texture_shape/<笔刷名>/ 时记录 "材质名 -> 换算后的 INI 参数"
+BRUSH_PARAMS_FILE_NAME = 'brush_params.json'
+
+def load_brush_params_file(folder):
+    path = os.path.join(folder, BRUSH_PARAMS_FILE_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def copy_ini_files(bmp_files, ini_source, brush_params=None):
+    """
+    为每个BMP文件生成同名INI文件，除非INI文件已存在。
+    需要在 ./defult/ 下存在 default.ini (或对应名称)，模板只读取一次；
+    brush_params 为 {材质名: {INI 键: 值}}，有对应参数的 BMP 按原笔刷参数生成。
     """
     ini_path = os.path.join('./defult', ini_source)
     if not os.path.exists(ini_path):
-        print(f"未找到指定的INI文件: {ini_path}")
+        logger.warning(f"未找到指定的INI文件: {ini_path}")
         return
 
+    template = load_ini_template(ini_path)
+    brush_params = brush_params or {}
     for bmp_file in bmp_files:
         directory = os.path.dirname(bmp_file)
         bmp_base_name = os.path.splitext(os.path.basename(bmp_file))[0]
         ini_target_path = os.path.join(directory, f"{bmp_base_name}.ini")
 
         if os.path.exists(ini_target_path):
-            print(f"INI文件已存在，跳过: {ini_target_path}")
+            logger.info(f"INI文件已存在，跳过: {ini_target_path}")
             continue
 
-        shutil.copy(ini_path, ini_target_path)
-        print(f"Copied and renamed INI file to {ini_target_path}")
+        texture_name = bmp_base_name[len('WARNING_'):] if bmp_base_name.startswith('WARNING_') else bmp_base_name
+        values = brush_params.get(texture_name)
+        with timed('ini'):
+            with open(ini_target_path, 'wb') as f:
+                f.write(template.render(values))
+        if values:
+            logger.info(f"已按笔刷参数生成INI: {ini_target_path}")
+        else:
+            logger.info(f"Copied and renamed INI file to {ini_target_path}")
 
-def assign_ini_to_bmp_in_folder(folder):
+def assign_ini_to_bmp_in_folder(folder, brush_params=None):
     """
-    在给定的 folder 目录(含子目录)中查找所有 .bmp 文件，为其复制INI。
+    在给定的 folder 目录(含子目录)中查找所有 .bmp 文件，为其生成INI。
     """
     bmp_files = find_bmp_files(folder)
     ini_file_name = 'default.ini'  # 确保 ./defult/default.ini 存在
-    copy_ini_files(bmp_files, ini_file_name)
+    copy_ini_files(bmp_files, ini_file_name, brush_params)
+
+def convert_folders_to_bmp_and_ini(folders, progress_callback=None, max_size=1024, jobs=None,
+                                   quality=DEFAULT_RESIZE_QUALITY, normalize=DEFAULT_NORMALIZE_MODE):
+    """
+    对每个文件夹：图片转换为 BMP 到 <文件夹>/bmp/，再为生成的 BMP 复制 .ini。
+    """
+    for idx, folder in enumerate(folders):
+        raise_if_cancelled()
+
+        # 第一步：PNG -> BMP
+        bmp_target_dir = os.path.join(folder, 'bmp')
+        folder_progress = None
+        if progress_callback:
+            folder_progress = lambda prog, idx=idx: progress_callback((idx + prog / 100) / len(folders) * 100)
+        convert_png_to_bmp(folder, bmp_target_dir, max_size, jobs, folder_progress, quality, normalize)
+
+        # 第二步：为生成的 BMP 文件生成对应 .ini（有笔刷参数时按参数填写）
+        assign_ini_to_bmp_in_folder(bmp_target_dir, load_brush_params_file(folder))
+
+        if progress_callback:
+            progress_callback((idx + 1) / len(folders) * 100)
 
 
 ############################################################
@@ -194,7 +615,56 @@ def ensure_unique_filename(base_name, ext, existing_files):
         counter += 1
     return new_file_path
 
-def copy_files_to_new_folder(files, target_dir, folder_name):
+def is_same_file_copy(src_path, dst_path):
+    """
+    判断 dst_path 是否是 src_path 之前用 shutil.copy2 复制出的、内容未变的副本。
+    """
+    try:
+        src_stat = os.stat(src_path)
+        dst_stat = os.stat(dst_path)
+    except OSError:
+        return False
+    return (src_stat.st_size == dst_stat.st_size
+            and src_stat.st_mtime_ns == dst_stat.st_mtime_ns)
+
+def file_content_key(file_path, use_hash=False):
+    """
+    文件内容指纹：(大小, CRC32)，use_hash=True 时改用 SHA-1 避免 CRC 碰撞。
+    """
+    digest = hashlib.sha1() if use_hash else None
+    crc = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            if digest:
+                digest.update(chunk)
+            else:
+                crc = zlib.crc32(chunk, crc)
+    return (os.path.getsize(file_path), digest.hexdigest() if digest else crc)
+
+def link_or_copy(src_path, dst_path):
+    """
+    优先创建硬链接（不占额外磁盘空间），文件系统不支持时退回复制。
+    """
+    if os.path.exists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copyfile(src_path, dst_path)
+
+# 去重时记录 "被跳过的文件 -> 保留的文件" 的对照表
+DUPLICATES_FILE_NAME = 'duplicates.json'
+
+def copy_files_to_new_folder(files, target_dir, folder_name, dedup=True):
+    """
+    把图片复制到 target_dir/folder_name/，shape/grain 分别重命名为 _s1/_g1...
+    dedup=True 时内容完全相同（大小和 SHA-1 都相同）的图片只保留第一张，其余记录到 duplicates.json，
+    这样后续转 BMP 时每种材质只转换一次。
+    图片旁边有 *_resolved_params.json 时换算后记录到 brush_params.json，供生成 INI 使用。
+    最后把这个文件夹的材质写入 target_dir 下的材质索引（见 index_texture_folder），
+    这里算出的 SHA-1 一并传给索引，每个文件只读一遍。
+    上次已经复制过、且索引中的大小和修改时间都对得上的文件直接沿用索引里的 SHA-1，不再读取。
+    """
     target_subdir = os.path.join(target_dir, folder_name)
     if not os.path.exists(target_subdir):
         os.makedirs(target_subdir)
@@ -202,37 +672,95 @@ def copy_files_to_new_folder(files, target_dir, folder_name):
     existing_files = set()
     shape_counter = 1
     grain_counter = 1
+    copied_by_content = {}  # 内容指纹 -> 已复制的文件名
+    duplicates = {}
+    brush_params = {}
+    params_by_dir = {}  # 同一笔刷的 Shape/Grain 只读取一次参数
+    uuids = {}  # 新文件名 -> 笔刷 UUID（所在目录名），写入索引用
+    hashes = {}  # 新文件名 -> SHA-1，写入索引用
+    indexed = indexed_file_hashes(target_subdir)
     
     for file_path in files:
         base_name = os.path.basename(file_path)
         name_without_ext, ext = os.path.splitext(base_name)
-        
-        # 检查文件名是否包含 shape 或 grain（不区分大小写）
+
+        # 检查文件名是否包含 shape 或 grain（不区分大小写）；重复的文件不占编号，所以先不递增计数
         name_lower = name_without_ext.lower()
         if 'shape' in name_lower:
             new_filename = f"{folder_name}_s{shape_counter}{ext}"
-            shape_counter += 1
         elif 'grain' in name_lower:
             new_filename = f"{folder_name}_g{grain_counter}{ext}"
-            grain_counter += 1
         else:
             # 保留原始文件名，但确保不重复
             new_filename = ensure_unique_filename(name_without_ext, ext, existing_files)
-        
         final_path = os.path.join(target_subdir, new_filename)
+
+        # copy2 会保留修改时间，大小和时间都一致说明上次已经复制过
+        unchanged = is_same_file_copy(file_path, final_path)
+        content_key = None
+        if unchanged and new_filename in indexed:
+            size, mtime_ns, content_hash = indexed[new_filename]
+            stat = os.stat(final_path)
+            if content_hash and (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                content_key = (size, content_hash)
+        if content_key is None:
+            content_key = file_content_key(file_path, use_hash=True)
+        if dedup:
+            if content_key in copied_by_content:
+                duplicates[file_path] = copied_by_content[content_key]
+                logger.info(f"内容重复，跳过: {file_path} (同 {copied_by_content[content_key]})")
+                continue
+
+        if 'shape' in name_lower:
+            shape_counter += 1
+        elif 'grain' in name_lower:
+            grain_counter += 1
+        if dedup:
+            copied_by_content[content_key] = new_filename
+        source_dir = os.path.dirname(file_path)
+        if source_dir not in params_by_dir:
+            params_by_dir[source_dir] = load_resolved_params(source_dir)
+        if params_by_dir[source_dir]:
+            brush_params[os.path.splitext(new_filename)[0]] = params_by_dir[source_dir]
+        uuids[new_filename] = os.path.basename(source_dir)
+        hashes[new_filename] = content_key[1]
+        if unchanged:
+            existing_files.add(final_path)
+            logger.info(f"未变化，跳过: {base_name} -> {new_filename}")
+            continue
         try:
             shutil.copy2(file_path, final_path)
             existing_files.add(final_path)
-            print(f"已复制: {base_name} -> {new_filename}")
+            logger.info(f"已复制: {base_name} -> {new_filename}")
         except IOError as e:
-            print(f"无法复制文件 {file_path} 到 {final_path}: {e}")
+            logger.error(f"无法复制文件 {file_path} 到 {final_path}: {e}")
+
+    duplicates_path = os.path.join(target_subdir, DUPLICATES_FILE_NAME)
+    if duplicates:
+        with open(duplicates_path, 'w', encoding='utf-8') as f:
+            json.dump(duplicates, f, indent=4, ensure_ascii=False)
+        logger.info(f"共跳过 {len(duplicates)} 张重复材质")
+    elif os.path.exists(duplicates_path):
+        os.remove(duplicates_path)
+
+    brush_params_path = os.path.join(target_subdir, BRUSH_PARAMS_FILE_NAME)
+    if brush_params:
+        with open(brush_params_path, 'w', encoding='utf-8') as f:
+            json.dump(brush_params, f, indent=4, ensure_ascii=False, sort_keys=True)
+    elif os.path.exists(brush_params_path):
+        os.remove(brush_params_path)
+
+    try:
+        index_texture_folder(target_subdir, uuids, hashes)
+    except Exception as e:
+        logger.error(f"更新材质索引失败: {e}")
 
 def extract_folder_name(source_dir):
     base_name = os.path.basename(source_dir)
     folder_name, _ = os.path.splitext(base_name)
     return folder_name
 
-def auto_process_images(source_dir, target_dir):
+def auto_process_images(source_dir, target_dir, dedup=True):
     """
     用于把解压得到的 PNG/JPG 文件复制到指定目标目录下，避免重复命名冲突。
     """
@@ -240,27 +768,77 @@ def auto_process_images(source_dir, target_dir):
         folder_name = extract_folder_name(source_dir)
         image_files = collect_image_files(source_dir)
         if not image_files:
-            print("未找到任何符合条件的图片文件。")
+            logger.warning("未找到任何符合条件的图片文件。")
             return
-        copy_files_to_new_folder(image_files, target_dir, folder_name)
-        print(f"所有图片文件已成功复制到 {os.path.join(target_dir, folder_name)}")
+        copy_files_to_new_folder(image_files, target_dir, folder_name, dedup)
+        logger.info(f"所有图片文件已成功复制到 {os.path.join(target_dir, folder_name)}")
     except Exception as e:
-        print(f"处理文件时发生错误: {e}")
+        logger.error(f"处理文件时发生错误: {e}")
 
 
 ############################################################
 #         4) 解析 .brushset（只提取 .png/.archive）
 ############################################################
 
+# 流式解压时每次读取的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 每个 cache/<文件名>.brushset/ 下记录上次解析结果的清单文件
+PARSE_MANIFEST_NAME = 'index.json'
+
+# 解析时提取的成员：材质图片，以及 Brush.archive（展开为 *_resolved_params.json），其他文件不提取
+PARSED_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def is_brush_archive(member):
+    return member.lower().endswith('.archive')
+
+def load_parse_manifest(manifest_path):
+    """
+    读取解析清单，文件不存在或损坏时返回空字典（相当于全部重新解析）。
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_parse_manifest(manifest_path, manifest):
+    """
+    先写临时文件再替换，避免中途退出留下半个清单。
+    """
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
 class BrushsetParser:
     """
     Parse archived textures of Procreate brushes, extracting .png/.jpg & .archive files.
     不做自动 BMP 转换。
+
+    extract_mode:
+        'stream' (默认) 直接把压缩包内的原始字节流式写入 cache/，不解码图片；
+        'decode' 旧方式，先用 PIL 解码再重新编码保存。
+    force:
+        默认会根据 cache/<文件名>.brushset/index.json 跳过未变化的压缩包和成员，
+        force=True 时全部重新解析。
+    dedup / dedup_hash:
+        默认按压缩包中央目录里的 CRC + 大小识别内容相同的图片，只解压一次，其余用硬链接；
+        dedup_hash=True 时额外比较 SHA-1，确认内容确实相同。
     """
-    def __init__(self, filename, progress_callback=None):
+    EXTRACT_MODES = ('stream', 'decode')
+
+    def __init__(self, filename, progress_callback=None, extract_mode='stream', force=False,
+                 dedup=True, dedup_hash=False):
+        if extract_mode not in self.EXTRACT_MODES:
+            raise ValueError(f"未知的提取模式: {extract_mode}")
         self.filename = filename
         self.progress_callback = progress_callback
-        print(f"Initialized parser with file: {filename}")
+        self.extract_mode = extract_mode
+        self.force = force
+        self.dedup = dedup
+        self.dedup_hash = dedup_hash
+        logger.debug(f"Initialized parser with file: {filename}")
 
     def check(self):
         return zipfile.is_zipfile(self.filename)
@@ -270,21 +848,49 @@ class BrushsetParser:
         解压并提取 .png/.jpg & .archive 文件到 cache/<文件名>.brushset
         并把提取到的图片复制到 ./texture_shape
         """
-        with zipfile.ZipFile(self.filename) as archive:
-            namelist = archive.namelist()
-            brushset_name = os.path.splitext(os.path.basename(self.filename))[0] + ".brushset"
-            base_directory = os.path.join('cache', brushset_name)
+        brushset_name = os.path.splitext(os.path.basename(self.filename))[0] + ".brushset"
+        base_directory = os.path.join('cache', brushset_name)
+        if not os.path.exists(base_directory):
+            os.makedirs(base_directory)
+
+        # 压缩包大小和修改时间都没变、上次的输出也都还在时，整个跳过解压
+        manifest_path = os.path.join(base_directory, PARSE_MANIFEST_NAME)
+        manifest = {} if self.force else load_parse_manifest(manifest_path)
+        previous_members = manifest.get('members', {})
+        archive_stat = os.stat(self.filename)
+        if (manifest.get('size') == archive_stat.st_size
+                and manifest.get('mtime') == archive_stat.st_mtime
+                and all(os.path.exists(self.member_output_path(base_directory, member))
+                        for member in previous_members)):
+            logger.info(f"笔刷文件未变化，跳过解压: {os.path.basename(self.filename)}")
+            if self.progress_callback:
+                self.progress_callback(100)
+            auto_process_images(base_directory, './texture_shape', self.dedup)
+            return
+
+        # 否则逐个成员比较中央目录里的 CRC，只解压有变化的部分
+        members = {}
+        extracted_by_content = {}  # (CRC, 大小) -> 本次已解压的文件路径
 
-            if not os.path.exists(base_directory):
-                os.makedirs(base_directory)
+        with zipfile.ZipFile(self.filename) as archive:
+            infolist = archive.infolist()
+            total_files = len(infolist)
+            previous_members = self.drop_stale_links(base_directory, infolist, previous_members)
+            for idx, info in enumerate(infolist):
+                raise_if_cancelled()
+                member = info.filename
 
-            total_files = len(namelist)
-            for idx, member in enumerate(namelist):
                 # 忽略以下文件夹
                 if any(folder in member for folder in ("AuthorPicture/", "QuickLook/", "Signature/")):
                     continue
 
-                if 'Reset' in member:
+                # <uuid>/Reset/ 下是笔刷的原始备份，与 <uuid>/ 下内容重复
+                if 'Reset' in member.split('/'):
+                    continue
+
+                # brushset.plist 等不提取的文件也不记入清单，否则跳过整个压缩包的检查永远不成立
+                is_image = member.lower().endswith(PARSED_IMAGE_EXTENSIONS)
+                if not is_image and not is_brush_archive(member):
                     continue
 
                 dirname = os.path.dirname(member)
@@ -292,30 +898,117 @@ class BrushsetParser:
                 if not os.path.exists(full_dir):
                     os.makedirs(full_dir)
 
+                out_path = os.path.join(base_directory, member)
+                output_path = self.member_output_path(base_directory, member)
+                unchanged = (previous_members.get(member) == info.CRC
+                             and os.path.exists(output_path))
+                members[member] = info.CRC
+
                 # 检查是否为PNG或JPG文件
-                if member.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    out_path = os.path.join(base_directory, member)
-                    with archive.open(member) as f:
-                        img = Image.open(f)
-                        img.save(out_path)
-                        print(f"已提取图片: {member}")
-                elif member.endswith('.archive'):
-                    out_path = os.path.join(base_directory, member)
-                    with archive.open(member) as f:
-                        params = plistlib.load(f)
-                    resolved_params = self.resolve_uids(params.get('$objects', []),
-                                                        params.get('$objects', [])[1])
-                    params_file_name = os.path.splitext(out_path)[0] + '_resolved_params.json'
+                if unchanged:
+                    logger.info(f"未变化，跳过: {member}")
+                elif is_image:
+                    content_key = (info.CRC, info.file_size)
+                    duplicate_of = extracted_by_content.get(content_key) if self.dedup else None
+                    if duplicate_of and self.is_duplicate_member(archive, member, duplicate_of):
+                        link_or_copy(duplicate_of, out_path)
+                        logger.info(f"内容重复，已链接: {member}")
+                    else:
+                        with timed('extract', member):
+                            self.extract_image(archive, member, out_path)
+                        extracted_by_content[content_key] = out_path
+                        logger.info(f"已提取图片: {member}")
+                else:
+                    resolved_params = read_brush_archive(archive, member)
+                    params_file_name = output_path
                     resolved_params = self.handle_bundled_textures(resolved_params, params_file_name)
                     with open(params_file_name, 'w', encoding='utf-8') as json_file:
-                        json.dump(resolved_params, json_file, indent=4)
+                        json.dump(resolved_params, json_file, indent=4, sort_keys=True)
 
                 # 更新进度
                 if self.progress_callback:
                     self.progress_callback((idx+1) / total_files * 100)
 
+        save_parse_manifest(manifest_path, {
+            'archive': os.path.abspath(self.filename),
+            'size': archive_stat.st_size,
+            'mtime': archive_stat.st_mtime,
+            'members': members,
+        })
+
         # 将图片文件复制到 ./texture_shape/<brushsetName>.brushset/
-        auto_process_images(base_directory, './texture_shape')
+        auto_process_images(base_directory, './texture_shape', self.dedup)
+
+    @staticmethod
+    def member_output_path(base_directory, member):
+        """
+        压缩包成员解析后在 cache/ 中对应的文件：.archive 对应 *_resolved_params.json
+        """
+        out_path = os.path.join(base_directory, member)
+        if is_brush_archive(member):
+            return os.path.splitext(out_path)[0] + '_resolved_params.json'
+        return out_path
+
+    @staticmethod
+    def drop_stale_links(base_directory, infolist, previous_members):
+        """
+        上次去重时用硬链接共用同一个文件的成员，只要其中有一个的内容变了（或清单里记录的 CRC 本就不同，
+        旧版本原地写入时会经共用的文件把其他成员一起改掉），这一组成员都从清单中去掉，全部重新解压。
+        """
+        current = {info.filename: info.CRC for info in infolist}
+        groups = {}  # (设备, inode) -> 共用该文件的成员
+        for member in previous_members:
+            if not member.lower().endswith(PARSED_IMAGE_EXTENSIONS):
+                continue
+            try:
+                stat = os.stat(os.path.join(base_directory, member))
+            except OSError:
+                continue
+            if stat.st_nlink > 1:
+                groups.setdefault((stat.st_dev, stat.st_ino), []).append(member)
+
+        stale = set()
+        for group in groups.values():
+            crcs = {previous_members[member] for member in group}
+            if len(crcs) > 1 or any(current.get(member) not in crcs for member in group):
+                stale.update(group)
+        if not stale:
+            return previous_members
+        logger.debug(f"硬链接共用的成员内容已不同，重新解压: {', '.join(sorted(stale))}")
+        return {member: crc for member, crc in previous_members.items() if member not in stale}
+
+    def is_duplicate_member(self, archive, member, extracted_path):
+        """
+        CRC 与大小已经相同；开启 dedup_hash 时再比较 SHA-1 确认。
+        """
+        if not self.dedup_hash:
+            return True
+        digest = hashlib.sha1()
+        with archive.open(member) as f:
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest() == file_content_key(extracted_path, use_hash=True)[1]
+
+    def extract_image(self, archive, member, out_path):
+        """
+        把压缩包内的图片写到 out_path。
+        stream 模式下按块复制原始字节，图片留到后续真正需要像素时再解码。
+        先写临时文件再替换：out_path 可能是去重时建的硬链接，原地写入会把共用这个文件的其他成员一起改掉。
+        """
+        root, ext = os.path.splitext(out_path)
+        tmp_path = f"{root}.tmp{ext}"
+        try:
+            with archive.open(member) as f:
+                if self.extract_mode == 'stream':
+                    with open(tmp_path, 'wb') as out_file:
+                        shutil.copyfileobj(f, out_file, STREAM_CHUNK_SIZE)
+                else:
+                    with Image.open(f) as img:
+                        img.save(tmp_path)
+            os.replace(tmp_path, out_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     def handle_bundled_textures(self, params, params_file_name):
         keys_to_check = ['bundledGrainPath', 'bundledShapePath']
@@ -330,35 +1023,1431 @@ class BrushsetParser:
                 if os.path.exists(src_path):
                     shutil.copy(src_path, dst_path)
                 else:
-                    print(f"[Warning] {src_path} not found, skip copying.")
+                    logger.warning(f"[Warning] {src_path} not found, skip copying.")
             else:
-                print(f"{key} is '$null'; trying default image path.")
+                logger.debug(f"{key} is '$null'; trying default image path.")
                 default_image = key.replace('bundled', '').replace('Path', '') + ".png"
                 default_image_path = os.path.join(base_dir, default_image)
                 if os.path.exists(default_image_path):
                     params[key] = default_image
                 else:
-                    print(f"Default image {default_image_path} not found.")
+                    logger.warning(f"Default image {default_image_path} not found.")
         return params
 
-    def resolve_uids(self, objects, obj):
-        if isinstance(obj, plistlib.UID):
-            return self.resolve_uids(objects, objects[obj.data])
-        elif isinstance(obj, dict):
-            return {k: self.resolve_uids(objects, v) for k, v in sorted(obj.items())}
-        elif isinstance(obj, list):
-            return [self.resolve_uids(objects, item) for item in obj]
-        elif isinstance(obj, bytes):
-            return obj.hex()
-        else:
-            return obj
+    @staticmethod
+    def resolve_uids(objects, obj):
+        """
+        把 NSKeyedArchiver 的 $objects 中以 UID 互相引用的对象展开成普通的 dict/list。
+        - 用显式栈代替递归，嵌套再深也不会超出递归上限；
+        - 每个 UID 只展开一次，之后的引用直接复用结果；
+        - 遇到循环引用时写入 {"$ref": UID 编号}，避免死循环。
+        """
+        resolved = {}        # UID 编号 -> 已展开的对象
+        in_progress = set()  # 正在展开（还在栈上）的 UID
+        root = [None]
+        # 栈中每一项: (要填充的容器, 剩余子项的迭代器, 容器对应的 UID 编号或 None)
+        stack = [(root, iter([(0, obj)]), None)]
+
+        while stack:
+            target, children, uid = stack[-1]
+            for key, value in children:
+                ref = None
+                if isinstance(value, plistlib.UID):
+                    ref = value.data
+                    if ref in resolved:
+                        target[key] = resolved[ref]
+                        continue
+                    if ref in in_progress:
+                        target[key] = {'$ref': ref}
+                        continue
+                    value = objects[ref]
+
+                if isinstance(value, dict):
+                    child = target[key] = {}
+                    items = iter(value.items())
+                elif isinstance(value, list):
+                    child = target[key] = [None] * len(value)
+                    items = iter(enumerate(value))
+                else:
+                    if isinstance(value, bytes):
+                        value = value.hex()
+                    if ref is not None:
+                        resolved[ref] = value
+                    target[key] = value
+                    continue
+
+                # 先展开子容器，当前容器剩下的子项等它完成后继续
+                if ref is not None:
+                    in_progress.add(ref)
+                stack.append((child, items, ref))
+                break
+            else:
+                stack.pop()
+                if uid is not None:
+                    in_progress.discard(uid)
+                    resolved[uid] = target
+
+        return root[0]
+
+
+############################################################
+#        5) 多个 .brushset 并行解析（进程池）
+############################################################
+
+class _ProgressRelay:
+    """
+    不开进程池时代替进度队列，直接把 (文件名, 进度) 转交给汇总函数。
+    """
+    def __init__(self, report):
+        self.report = report
+
+    def put(self, item):
+        self.report(*item)
+
+def _init_pool_worker(budget, log_queue, verdict_db_path, cancel_event):
+    """
+    进程池子进程的初始化：设置共享的内存预算、取消标记和白底判断的缓存文件，日志全部转发给主进程。
+    换成主进程共享的取消标记后，子进程里的 raise_if_cancelled 在处理下一个成员前就能发现用户取消了任务。
+    """
+    global _cancel_event
+    _cancel_event = cancel_event
+    set_memory_budget(budget)
+    set_verdict_cache(verdict_db_path)
+    install_worker_log_handler(log_queue)
+
+def run_brushset_jobs(job, filenames, job_kwargs=None, progress_callback=None, max_workers=None):
+    """
+    把多个 .brushset 分发到进程池并行处理，每个进程负责一个压缩包。
+    job(filename, progress_queue, **job_kwargs) 需要是模块级函数，出错时返回错误信息。
+    progress_callback 收到的是所有文件合计的进度 (0-100)。
+    单个文件出错不会中断其他文件，返回 {文件名: 错误信息}，全部成功时为空字典。
+    """
+    errors = {}
+    if not filenames:
+        return errors
+    job_kwargs = job_kwargs or {}
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(filenames))
+
+    file_progress = {filename: 0 for filename in filenames}
+
+    def report(filename, prog):
+        file_progress[filename] = prog
+        if progress_callback:
+            progress_callback(sum(file_progress.values()) / len(filenames))
+
+    if max_workers <= 1:
+        # 只有一个文件（或只允许一个进程）时直接在当前进程处理，省去启动进程池的开销
+        relay = _ProgressRelay(report)
+        for filename in filenames:
+            raise_if_cancelled()
+            with timings.archive(os.path.basename(filename)):
+                error = job(filename, relay, **job_kwargs)
+            if error:
+                errors[filename] = error
+                logger.error(f"[Error] 处理 {os.path.basename(filename)} 失败: {error}")
+            report(filename, 100)
+        return errors
+
+    with multiprocessing.Manager() as manager, forward_worker_logs(manager) as log_queue:
+        progress_queue = manager.Queue()
+        worker_cancel = manager.Event()
+        # 各进程共用同一份内存预算，同时解码的大图总量不会随进程数增长
+        with concurrent_futures.ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_pool_worker,
+                initargs=(_memory_budget.shared(manager), log_queue, invert_verdicts.db_path,
+                          worker_cancel)) as pool:
+            pending = {
+                pool.submit(_run_timed_job, job, filename, progress_queue, **job_kwargs): filename
+                for filename in filenames
+            }
+            while pending:
+                if _cancel_event.is_set():
+                    # 尚未开始的压缩包直接取消，正在处理的在下一个成员之前停下
+                    worker_cancel.set()
+                    for future in pending:
+                        future.cancel()
+                    raise JobCancelled()
+                done, _ = concurrent_futures.wait(pending, timeout=0.1,
+                                                  return_when=concurrent_futures.FIRST_COMPLETED)
+                while not progress_queue.empty():
+                    report(*progress_queue.get())
+                for future in done:
+                    filename = pending.pop(future)
+                    try:
+                        error, job_timings = future.result()
+                        timings.merge(job_timings)
+                    except Exception as e:
+                        # 子进程异常退出等情况
+                        error = f"{type(e).__name__}: {e}"
+                    if error:
+                        errors[filename] = error
+                        logger.error(f"[Error] 处理 {os.path.basename(filename)} 失败: {error}")
+                    report(filename, 100)
+    return errors
+
+def _run_timed_job(job, filename, progress_queue, **job_kwargs):
+    """
+    在子进程中运行 job，把子进程里记录的各阶段耗时一起交回主进程汇总。
+    """
+    timings.reset()
+    with timings.archive(os.path.basename(filename)):
+        error = job(filename, progress_queue, **job_kwargs)
+    return error, timings.snapshot()
+
+def _parse_brushset_job(filename, progress_queue, extract_mode='stream'):
+    """
+    解析单个 .brushset，进度通过 progress_queue 回传。
+    返回错误信息，成功则返回 None。
+    """
+    try:
+        parser = BrushsetParser(
+            filename,
+            progress_callback=lambda prog: progress_queue.put((filename, prog)),
+            extract_mode=extract_mode
+        )
+        if not parser.check():
+            return f"{os.path.basename(filename)} 不是有效的 .brushset 文件。"
+        parser.parse()
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+def parse_brushsets(filenames, progress_callback=None, max_workers=None, extract_mode='stream'):
+    """
+    并行解析多个 .brushset 到 cache/ 与 texture_shape/，返回 {文件名: 错误信息}。
+    """
+    return run_brushset_jobs(_parse_brushset_job, filenames, {'extract_mode': extract_mode},
+                             progress_callback, max_workers)
+
+
+############################################################
+#        6) 后台任务：耗时操作放到工作线程，界面不再卡死
+############################################################
+
+class JobCancelled(Exception):
+    """用户点击了【取消任务】。"""
+
+# 同一时间只运行一个后台任务，所以取消标记用一个全局 Event 即可
+_cancel_event = threading.Event()
+
+def raise_if_cancelled():
+    """
+    在耗时循环中调用：若用户请求取消，则抛出 JobCancelled 结束当前任务。
+    """
+    if _cancel_event.is_set():
+        raise JobCancelled()
+
+class QueueWriter:
+    """
+    替换 sys.stdout，把 print 的每一行放进队列交给界面显示，同时保留原始输出。
+    （pyinstaller --windowed 打包后 sys.stdout 为 None）
+    """
+    def __init__(self, log_queue, stream=None):
+        self.log_queue = log_queue
+        self.stream = stream
+        self._buffer = ""
+
+    def write(self, text):
+        if self.stream is not None:
+            self.stream.write(text)
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            if line.strip():
+                self.log_queue.put(('log', line))
+        return len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+class JobRunner:
+    """
+    在后台线程中运行耗时任务。
+    工作线程不直接操作 Tk 控件，进度与日志都放进队列，由主线程通过 root.after 轮询后更新界面。
+    """
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, root, progress_label, progress_bar, status_label):
+        self.root = root
+        self.progress_label = progress_label
+        self.progress_bar = progress_bar
+        self.status_label = status_label
+        self.queue = queue.Queue()
+        self.thread = None
+        self.on_done = None
+        self.last_run = None
+        # 设置环境变量 PRCT2SAI_PROFILE=cprofile / tracemalloc 可对界面中的任务做性能分析
+        self.profile = os.environ.get('PRCT2SAI_PROFILE', 'none')
+        sys.stdout = QueueWriter(self.queue, sys.stdout)
+
+    def is_busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def submit(self, func, *args, on_done=None, **kwargs):
+        """
+        在工作线程中执行 func(*args, **kwargs)。
+        任务成功结束后在主线程中调用 on_done(返回值)。
+        """
+        if self.is_busy():
+            messagebox.showwarning("提示", "已有任务正在运行，请等待完成或先取消。")
+            return False
+
+        _cancel_event.clear()
+        self.on_done = on_done
+        reset_progress(self.progress_label, self.progress_bar)
+        self.thread = threading.Thread(target=self._run, args=(func, args, kwargs), daemon=True)
+        self.thread.start()
+        self.root.after(self.POLL_INTERVAL_MS, self._poll)
+        return True
+
+    def report_progress(self, progress):
+        """
+        可在任意线程中调用，作为各处理函数的 progress_callback。
+        """
+        self.queue.put(('progress', progress))
+
+    def cancel(self):
+        if self.is_busy():
+            _cancel_event.set()
+            self.status_label.config(text="正在取消，当前图片处理完后停止...")
+
+    def _run(self, func, args, kwargs):
+        run = None
+        try:
+            with instrumented_run(func.__name__, self.profile) as run:
+                result = func(*args, **kwargs)
+        except JobCancelled:
+            outcome = ('cancelled', None)
+        except Exception as e:
+            outcome = ('error', e)
+        else:
+            outcome = ('done', result)
+        # 先记下耗时报告再通知主线程，_finish 中才能读到
+        self.last_run = run
+        self.queue.put(outcome)
+
+    def _poll(self):
+        finished = False
+        while True:
+            try:
+                kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                update_progress(payload, self.progress_label, self.progress_bar)
+            elif kind == 'log':
+                self.status_label.config(text=payload)
+            else:
+                finished = True
+                self._finish(kind, payload)
+
+        if not finished:
+            self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _finish(self, kind, payload):
+        reset_progress(self.progress_label, self.progress_bar)
+        on_done, self.on_done = self.on_done, None
+        if kind == 'cancelled':
+            self.status_label.config(text="任务已取消")
+            messagebox.showinfo("提示", "任务已取消。")
+        elif kind == 'error':
+            self.status_label.config(text=f"任务出错: {payload}")
+            messagebox.showerror("错误", f"任务出错: {payload}")
+        else:
+            if self.last_run:
+                self.status_label.config(text=f"任务完成，{summarize_run(self.last_run)}")
+            else:
+                self.status_label.config(text="任务完成")
+            if on_done:
+                on_done(payload)
+
+
+############################################################
+#   7) 一键转换：.brushset 直接生成 SAI 用的 BMP + INI
+############################################################
+
+# 笔刷包中不需要转换的文件夹
+SKIPPED_BRUSHSET_FOLDERS = ("AuthorPicture", "QuickLook", "Signature", "Reset")
+
+def is_brushset_texture(member):
+    """
+    是否为需要转换的材质图片（排除作者头像、缩略图、签名和 Reset 备份）。
+    """
+    if not member.lower().endswith(('.png', '.jpg', '.jpeg')):
+        return False
+    return not any(folder in member.split('/') for folder in SKIPPED_BRUSHSET_FOLDERS)
+
+def read_brush_archive(archive, member):
+    """
+    读取压缩包中的 Brush.archive，返回展开后的笔刷参数。
+    """
+    with timed('resolve', member):
+        with archive.open(member) as f:
+            params = plistlib.load(f)
+        objects = params.get('$objects', [])
+        return BrushsetParser.resolve_uids(objects, objects[1])
+
+def read_brushset_params(archive):
+    """
+    读取压缩包中每个笔刷的参数并换算成 INI 参数，返回 {笔刷目录: {INI 键: 值}}。
+    """
+    params_by_dir = {}
+    for member in archive.namelist():
+        if not is_brush_archive(member):
+            continue
+        if any(folder in member.split('/') for folder in SKIPPED_BRUSHSET_FOLDERS):
+            continue
+        try:
+            params_by_dir[os.path.dirname(member)] = map_brush_params(read_brush_archive(archive, member))
+        except Exception as e:
+            logger.error(f"无法读取笔刷参数 {member}: {e}")
+    return params_by_dir
+
+def read_archive_member(archive, member):
+    with timed('extract', member):
+        return archive.read(member)
+
+def iter_brushset_textures(filename, dedup=True):
+    """
+    逐个读出 .brushset 中的材质图片，产出 (成员名, 原始字节)。
+    dedup=True 时按 CRC + 大小跳过内容相同的图片。
+    """
+    seen = set()
+    with zipfile.ZipFile(filename) as archive:
+        for info in archive.infolist():
+            member = info.filename
+            if not is_brushset_texture(member):
+                continue
+            if dedup:
+                content_key = (info.CRC, info.file_size)
+                if content_key in seen:
+                    logger.info(f"内容重复，跳过: {member}")
+                    continue
+                seen.add(content_key)
+            # 直接交给下游，生成器里不留这份字节的引用
+            yield member, read_archive_member(archive, member)
+
+def decode_textures(textures, max_size=1024, quality=DEFAULT_RESIZE_QUALITY,
+                    normalize=DEFAULT_NORMALIZE_MODE, invert='none', prefer_invert=False):
+    """
+    解码并转为灰度图，产出 (成员名, L 模式图片, 是否需要反相)。
+    invert='auto' 时在转灰度之前（保留透明通道）判断白底，与 needs_invert_file 共用按内容 SHA-1 的缓存；
+    prefer_invert 只在图片本身判断不出底色时起作用（见 apply_invert_hint）。
+    'always' 全部反相，'none' 都不反相。
+    """
+    for member, data in textures:
+        content_hash = hashlib.sha1(data).hexdigest() if invert == 'auto' else None
+        buffer = io.BytesIO(data)
+        # 之后压缩数据只由 buffer 持有，解码完关闭 buffer 就能释放
+        del data
+        try:
+            img = Image.open(buffer)
+            # 如果是动图，只取第一帧
+            if hasattr(img, 'is_animated') and img.is_animated:
+                img.seek(0)
+            draft_for_normalization(img, max_size, normalize, quality, 'L')
+        except Exception as e:
+            logger.error(f"无法解码 {member}: {e}")
+            buffer.close()
+            continue
+
+        # 预算一直占到下游处理完这张图、来取下一张为止
+        with _memory_budget.reserve(estimate_decode_bytes(img, max_size)):
+            try:
+                with img:
+                    with timed('decode', member):
+                        img.load()
+                    buffer.close()
+                    needs_invert = invert == 'always'
+                    if content_hash is not None:
+                        with timed('invert', member):
+                            verdict = cached_background_verdict(content_hash, lambda: classify_background(img))
+                        needs_invert = apply_invert_hint(verdict, prefer_invert)
+                    with timed('decode', member):
+                        gray = img.convert('L')
+            except Exception as e:
+                logger.error(f"无法解码 {member}: {e}")
+                continue
+            finally:
+                buffer.close()
+            yield member, gray, needs_invert
+
+def normalize_textures(images, max_size=1024, quality=DEFAULT_RESIZE_QUALITY,
+                       normalize=DEFAULT_NORMALIZE_MODE):
+    """
+    规范为 SAI 标准分辨率，产出 (成员名, 图片, 是否为标准尺寸)。
+    """
+    for member, img in images:
+        with timed('resize', member):
+            normalized = normalize_image(img, member, max_size, normalize, quality)
+        if normalized is not img:
+            img.close()
+        yield member, normalized, normalized.size in SUPPORTED_RESOLUTIONS
+
+# 一键转换时的反相方式
+INVERT_MODES = ('none', 'auto', 'always')
+
+def invert_textures(images):
+    """
+    反相 decode_textures 判断为需要反相的图片，产出 (成员名, 图片)。
+    在补边之前进行，补出的黑边不会影响白底判断。
+    """
+    for member, img, needs_invert in images:
+        if needs_invert:
+            with timed('invert', member):
+                original, img = img, invert_image(img)
+                original.close()
+            logger.info(f"已反相: {member}")
+        yield member, img
+
+def convert_brushset_to_sai(filename, output_dir='./texture_shape', ini_source='default.ini',
+                            progress_callback=None, invert='none', max_size=1024,
+                            quality=DEFAULT_RESIZE_QUALITY, normalize=DEFAULT_NORMALIZE_MODE):
+    """
+    不经过 cache/ 和中间 PNG，直接把 .brushset 中的材质转换为
+    <output_dir>/<笔刷名>/bmp/ 下的 BMP，并为每个 BMP 写好 INI。
+    命名规则与 copy_files_to_new_folder 相同：<笔刷名>_s1.bmp / <笔刷名>_g1.bmp。
+    invert 见 INVERT_MODES，max_size 为允许的最大边长 (256/512/1024)，
+    quality 见 RESIZE_QUALITIES，normalize 见 NORMALIZE_MODES。
+    返回生成的 BMP 路径列表。
+    """
+    if invert not in INVERT_MODES:
+        raise ValueError(f"未知的反相方式: {invert}")
+    set_name = extract_folder_name(filename)
+
+    target_dir = os.path.join(output_dir, set_name, 'bmp')
+    wrong_size_dir = os.path.join(target_dir, 'WRONGSIZE')
+    os.makedirs(wrong_size_dir, exist_ok=True)
+
+    with zipfile.ZipFile(filename) as archive:
+        # 与 iter_brushset_textures 一样按 CRC + 大小去重后再计数，进度才能走到 100%
+        total = len({(info.CRC, info.file_size) for info in archive.infolist()
+                     if is_brushset_texture(info.filename)}) or 1
+        params_by_dir = read_brushset_params(archive)
+
+    counters = {'shape': 0, 'grain': 0}
+    existing_names = set()
+    bmp_files = []
+    brush_params = {}
+    pipeline = normalize_textures(
+        invert_textures(
+            decode_textures(iter_brushset_textures(filename), max_size, quality, normalize,
+                            invert, brushset_needs_invert(set_name))
+        ),
+        max_size, quality, normalize
+    )
+    for idx, (member, img, is_standard) in enumerate(pipeline):
+        raise_if_cancelled()
+
+        name_without_ext = os.path.splitext(os.path.basename(member))[0]
+        name_lower = name_without_ext.lower()
+        if 'shape' in name_lower:
+            counters['shape'] += 1
+            base_filename = f"{set_name}_s{counters['shape']}"
+        elif 'grain' in name_lower:
+            counters['grain'] += 1
+            base_filename = f"{set_name}_g{counters['grain']}"
+        else:
+            base_filename = os.path.splitext(
+                ensure_unique_filename(name_without_ext, '.bmp', existing_names))[0]
+        existing_names.add(f"{base_filename}.bmp")
+        if params_by_dir.get(os.path.dirname(member)):
+            brush_params[base_filename] = params_by_dir[os.path.dirname(member)]
+
+        if is_standard:
+            bmp_path = os.path.join(target_dir, f"{base_filename}.bmp")
+            logger.info(f"已转换: {member} -> {os.path.basename(bmp_path)}")
+        else:
+            bmp_path = os.path.join(wrong_size_dir, f"WARNING_{base_filename}.bmp")
+            logger.info(f"不规范尺寸，已移至WRONGSIZE: {member}")
+        with timed('encode', member):
+            save_bmp(img, bmp_path)
+        img.close()
+        bmp_files.append(bmp_path)
+
+        if progress_callback:
+            progress_callback(min((idx + 1) / total * 100, 100))
+
+    copy_ini_files(bmp_files, ini_source, brush_params)
+    invert_verdicts.flush()
+    if progress_callback:
+        progress_callback(100)
+    logger.info(f"\n>>> 一键转换完成：{target_dir}")
+    return bmp_files
+
+def _convert_brushset_job(filename, progress_queue, **options):
+    """
+    一键转换单个 .brushset，进度通过 progress_queue 回传。
+    返回错误信息，成功则返回 None。
+    """
+    try:
+        if not zipfile.is_zipfile(filename):
+            return f"{os.path.basename(filename)} 不是有效的 .brushset 文件。"
+        convert_brushset_to_sai(
+            filename,
+            progress_callback=lambda prog: progress_queue.put((filename, prog)),
+            **options
+        )
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+def convert_brushsets_to_sai(filenames, output_dir='./texture_shape', progress_callback=None,
+                             max_workers=None, invert='none', max_size=1024,
+                             quality=DEFAULT_RESIZE_QUALITY, normalize=DEFAULT_NORMALIZE_MODE):
+    """
+    并行一键转换多个 .brushset，单个文件出错不影响其他文件。
+    返回 {文件名: 错误信息}。
+    """
+    options = {'output_dir': output_dir, 'invert': invert, 'max_size': max_size, 'quality': quality,
+               'normalize': normalize}
+    return run_brushset_jobs(_convert_brushset_job, filenames, options,
+                             progress_callback, max_workers)
+
+
+############################################################
+#   8) 命令行：不打开界面，批量转换
+############################################################
+
+def _report_cli_progress(progress):
+    sys.stderr.write(f"\r进度: {int(progress)}%")
+    sys.stderr.flush()
+
+def _print_cli_errors(errors):
+    sys.stderr.write("\n")
+    for filename, error in errors.items():
+        print(f"[失败] {filename}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(
+        prog='prct2sai_v7.py',
+        description="Procreate 笔刷工具箱（命令行模式）。不带参数运行时打开图形界面。"
+    )
+    parser.add_argument('--profile', choices=PROFILE_MODES, default='none',
+                        help="性能分析：cprofile 保存 .prof，tracemalloc 记录内存占用最多的代码行")
+    parser.add_argument('--verbose', '-v', action='store_true', help="输出调试信息")
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET_MB, metavar='MB',
+                        help=f"同时解码的图片最多占用的内存（默认 {DEFAULT_MEMORY_BUDGET_MB} MB，0 表示不限制）")
+    parser.add_argument('--verdict-cache', metavar='FILE',
+                        help=f"白底判断结果的缓存文件，off 表示不缓存"
+                             f"（默认为环境变量 {VERDICT_CACHE_ENV} 或程序目录下的 cache/invert_verdicts.db）")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    convert = sub.add_parser('convert', help="一键把 .brushset 转换为 SAI 用的 BMP + INI")
+    convert.add_argument('brushsets', nargs='+', help=".brushset 文件")
+    convert.add_argument('--out', default='./texture_shape', help="输出目录（默认 ./texture_shape）")
+    convert.add_argument('--jobs', type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    convert.add_argument('--invert', choices=INVERT_MODES, default='none', help="反相方式")
+    convert.add_argument('--size', type=int, choices=(256, 512, 1024), default=1024,
+                         help="最大边长（默认 1024）")
+    convert.add_argument('--quality', choices=tuple(RESIZE_QUALITIES), default=DEFAULT_RESIZE_QUALITY,
+                         help="缩放质量：fast 最快，best 最精细（默认 balanced）")
+    convert.add_argument('--normalize', choices=NORMALIZE_MODES, default=DEFAULT_NORMALIZE_MODE,
+                         help="非标准尺寸的处理：fit 缩放补边 / pad 只补边 / crop 居中裁切 / stretch 旧版拉伸（默认 fit）")
+
+    parse = sub.add_parser('parse', help="解析 .brushset 到 cache/ 与 texture_shape/")
+    parse.add_argument('brushsets', nargs='+', help=".brushset 文件")
+    parse.add_argument('--jobs', type=int, default=None, help="并行进程数（默认 CPU 核数）")
+
+    bmp = sub.add_parser('bmp', help="把文件夹中的图片转换为 BMP 并复制 INI（同【图像转BMP和INI】）")
+    bmp.add_argument('folders', nargs='+', help="图片文件夹")
+    bmp.add_argument('--size', type=int, choices=(256, 512, 1024), default=1024,
+                     help="最大边长（默认 1024）")
+    bmp.add_argument('--jobs', type=int, default=None, help="并行线程数（默认 CPU 核数）")
+    bmp.add_argument('--quality', choices=tuple(RESIZE_QUALITIES), default=DEFAULT_RESIZE_QUALITY,
+                     help="缩放质量：fast 最快，best 最精细（默认 balanced）")
+    bmp.add_argument('--normalize', choices=NORMALIZE_MODES, default=DEFAULT_NORMALIZE_MODE,
+                     help="非标准尺寸的处理：fit 缩放补边 / pad 只补边 / crop 居中裁切 / stretch 旧版拉伸（默认 fit）")
+
+    invert = sub.add_parser('invert', help="反相图像文件（同【手动反相处理】/【智能反相处理】）")
+    invert.add_argument('images', nargs='+', help="图像文件")
+    invert.add_argument('--auto', action='store_true', help="只反相检测为白底的图片")
+
+    index = sub.add_parser('index', help="重建 texture_shape/ 的材质索引（解析时会自动更新）")
+    index.add_argument('--root', default='./texture_shape', help="材质目录（默认 ./texture_shape）")
+
+    search = sub.add_parser('search', help="在材质索引中查找材质，例如 search --kind grain --size 1024")
+    search.add_argument('--root', default='./texture_shape',
+                        help="解析输出的材质目录（默认 ./texture_shape；convert 的输出不建索引）")
+    search.add_argument('--kind', choices=TEXTURE_KINDS, help="材质类型")
+    search.add_argument('--size', type=int, help="长边像素数")
+    search.add_argument('--set', dest='brushset', help="笔刷名中包含的文字")
+    search.add_argument('--needs-invert', choices=('yes', 'no'), help="只找白底（yes）或黑底（no）的材质")
+    search.add_argument('--hash', dest='content_hash', help="文件内容的 SHA-1")
+    search.add_argument('--limit', type=int, help="最多显示多少条")
+    search.add_argument('--json', action='store_true', help="以 JSON 输出全部字段")
+
+    watch = sub.add_parser('watch', help="监视文件夹，自动解析新放入的 .brushset、把新图片转换为 BMP 和 INI")
+    watch.add_argument('folders', nargs='+', help="要监视的文件夹")
+    watch.add_argument('--interval', type=float, default=2.0, help="扫描间隔秒数（默认 2）")
+    watch.add_argument('--settle', type=float, default=3.0,
+                       help="文件多少秒没有变化才处理，避免处理还没复制完的文件（默认 3）")
+    watch.add_argument('--once', action='store_true', help="只处理一次现有的新文件，不持续监视")
+    watch.add_argument('--skip-existing', action='store_true', help="启动时已有的文件都不处理")
+    watch.add_argument('--jobs', type=int, default=None, help="并行数（默认 CPU 核数）")
+    watch.add_argument('--size', type=int, choices=(256, 512, 1024), default=1024,
+                       help="最大边长（默认 1024）")
+    watch.add_argument('--quality', choices=tuple(RESIZE_QUALITIES), default=DEFAULT_RESIZE_QUALITY,
+                       help="缩放质量：fast 最快，best 最精细（默认 balanced）")
+    watch.add_argument('--normalize', choices=NORMALIZE_MODES, default=DEFAULT_NORMALIZE_MODE,
+                       help="非标准尺寸的处理：fit 缩放补边 / pad 只补边 / crop 居中裁切 / stretch 旧版拉伸（默认 fit）")
+    return parser
+
+def cli_main(argv=None):
+    """
+    命令行入口，例如：
+        python prct2sai_v7.py convert a.brushset b.brushset --out out --jobs 4 --invert auto --size 512
+    """
+    args = build_cli_parser().parse_args(argv)
+    if args.verbose:
+        console_handler.setLevel(logging.DEBUG)
+    set_memory_budget(args.memory_budget)
+    if args.verdict_cache is not None:
+        set_verdict_cache(parse_verdict_cache_path(args.verdict_cache))
+
+    # 查询只读索引，输出给管道使用，不附加耗时报告
+    if args.command == 'search':
+        return _run_cli_search(args)
+    # 监视会一直运行，每批文件各自生成耗时报告
+    if args.command == 'watch':
+        return _run_cli_watch(args)
+    with instrumented_run(args.command, args.profile):
+        return _run_cli_command(args)
+
+def _run_cli_command(args):
+    if args.command == 'convert':
+        errors = convert_brushsets_to_sai(
+            args.brushsets, args.out, progress_callback=_report_cli_progress,
+            max_workers=args.jobs, invert=args.invert, max_size=args.size, quality=args.quality,
+            normalize=args.normalize
+        )
+        return _print_cli_errors(errors)
+    if args.command == 'parse':
+        errors = parse_brushsets(args.brushsets, progress_callback=_report_cli_progress,
+                                 max_workers=args.jobs)
+        return _print_cli_errors(errors)
+    if args.command == 'bmp':
+        convert_folders_to_bmp_and_ini(args.folders, _report_cli_progress, args.size, args.jobs,
+                                       args.quality, args.normalize)
+        return _print_cli_errors({})
+    if args.command == 'invert':
+        invert_image_files(args.images, auto_detect=args.auto, progress_callback=_report_cli_progress)
+        return _print_cli_errors({})
+    if args.command == 'index':
+        rebuild_texture_index(args.root)
+        return 0
+    return 2
+
+def _run_cli_watch(args):
+    try:
+        watch_folders(args.folders, args.interval, args.once, args.skip_existing, args.profile,
+                      settle=args.settle, max_size=args.size, jobs=args.jobs, quality=args.quality,
+                      normalize=args.normalize)
+    except KeyboardInterrupt:
+        logger.info("已停止监视")
+    return 0
+
+def _run_cli_search(args):
+    if not os.path.exists(os.path.join(args.root, INDEX_DB_NAME)):
+        if glob.glob(os.path.join(glob.escape(args.root), '*', 'bmp')):
+            print(f"{args.root} 是一键转换（convert）的输出，不建材质索引；"
+                  f"请对解析（parse）输出的 texture_shape/ 查找。", file=sys.stderr)
+        else:
+            print(f"{args.root} 下还没有材质索引，请先解析笔刷或运行 index 命令。", file=sys.stderr)
+        return 1
+    needs_invert = None if args.needs_invert is None else args.needs_invert == 'yes'
+    rows = search_textures(args.root, args.kind, args.size, args.brushset, needs_invert,
+                           args.content_hash, args.limit)
+    if args.json:
+        print(json.dumps(rows, indent=4, ensure_ascii=False))
+    else:
+        for row in rows:
+            print(row['path'])
+    return 0
+
+
+############################################################
+#        9) 日志与各阶段耗时统计
+############################################################
+
+# 所有输出都经过 logger：控制台（或界面的状态栏）显示 INFO 以上，
+# logs/prct2sai.log 记录全部内容，打包成无控制台的窗口程序后也能事后查看
+logger = logging.getLogger('prct2sai')
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    每次都写到当前的 sys.stdout：界面会把它换成 QueueWriter，打包后的窗口程序中它为 None。
+    """
+    def emit(self, record):
+        if sys.stdout is None:
+            return
+        self.stream = sys.stdout
+        super().emit(record)
+
+console_handler = _StdoutHandler()
+console_handler.setLevel(logging.INFO)
+console_handler.setFormatter(logging.Formatter('%(message)s'))
+logger.addHandler(console_handler)
+
+LOG_DIR = 'logs'
+LOG_FILE_NAME = 'prct2sai.log'
+_file_handler = None
+
+def enable_file_logging(log_dir=LOG_DIR):
+    """
+    第一次运行任务时开始把日志追加到 logs/prct2sai.log。
+    """
+    global _file_handler
+    if _file_handler is not None:
+        return
+    os.makedirs(log_dir, exist_ok=True)
+    _file_handler = logging.FileHandler(os.path.join(log_dir, LOG_FILE_NAME), encoding='utf-8')
+    _file_handler.setLevel(logging.DEBUG)
+    _file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s %(levelname)s [%(processName)s/%(threadName)s] %(message)s'))
+    logger.addHandler(_file_handler)
+
+@contextlib.contextmanager
+def forward_worker_logs(manager):
+    """
+    在主进程中接收子进程发来的日志，交给主进程的 handler（控制台 / 界面状态栏、logs/prct2sai.log）输出。
+    Windows 上子进程是 spawn 出来的，没有文件 handler，打包后的窗口程序中 stdout 也是 None，
+    不转发的话子进程里的日志就丢了。产出的队列传给 install_worker_log_handler。
+    """
+    log_queue = manager.Queue()
+    listener = logging_handlers.QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        yield log_queue
+    finally:
+        listener.stop()
+
+def install_worker_log_handler(log_queue):
+    """
+    在子进程中调用：去掉（fork 时继承来的）handler，日志改为放进队列，由主进程统一输出。
+    """
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging_handlers.QueueHandler(log_queue))
+
+class StageTimer:
+    """
+    线程安全地累计各阶段（extract / resolve / decode / resize / invert / encode / ini）的耗时，
+    同时按文件累计，用来找出最慢的文件。
+    不同笔刷包里的成员名经常相同（<UUID>/Shape.png），所以文件按 (压缩包, 成员名) 区分，
+    压缩包由 archive() 设置，只对当前线程有效。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}  # 阶段 -> [次数, 总耗时, 最长一次]
+            self.items = {}   # (压缩包, 文件) -> 总耗时，不在处理压缩包时压缩包为 None
+
+    @contextlib.contextmanager
+    def archive(self, name):
+        """
+        with timings.archive(压缩包名): ... 期间记录的文件都算在这个压缩包名下。
+        """
+        previous = getattr(self._local, 'archive', None)
+        self._local.archive = name
+        try:
+            yield
+        finally:
+            self._local.archive = previous
+
+    @contextlib.contextmanager
+    def span(self, stage, item=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, item)
+
+    def add(self, stage, elapsed, item=None):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            if item is not None:
+                key = (getattr(self._local, 'archive', None), item)
+                self.items[key] = self.items.get(key, 0.0) + elapsed
+
+    def snapshot(self):
+        """
+        可以 pickle 的副本，用于从子进程传回主进程。
+        """
+        with self._lock:
+            return {'stages': {stage: list(entry) for stage, entry in self.stages.items()},
+                    'items': dict(self.items)}
+
+    def merge(self, snapshot):
+        with self._lock:
+            for stage, (count, total, longest) in snapshot['stages'].items():
+                entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+            for item, elapsed in snapshot['items'].items():
+                self.items[item] = self.items.get(item, 0.0) + elapsed
+
+    def summary(self, top=5):
+        """
+        按总耗时从多到少排列的各阶段统计，以及最慢的 top 个文件。
+        """
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda kv: kv[1][1], reverse=True)
+            slowest = sorted(self.items.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        return {
+            'stages': {stage: {'count': count, 'seconds': round(total, 4), 'max_seconds': round(longest, 4)}
+                       for stage, (count, total, longest) in stages},
+            'slowest_items': [{'archive': archive, 'item': item, 'seconds': round(elapsed, 4)}
+                              for (archive, item), elapsed in slowest],
+        }
+
+timings = StageTimer()
+
+def timed(stage, item=None):
+    """
+    with timed('decode', 文件): ... 把这段代码的耗时记到 stage 阶段（和该文件）名下。
+    """
+    return timings.span(stage, item)
+
+# 任务运行时可选的性能分析方式
+PROFILE_MODES = ('none', 'cprofile', 'tracemalloc')
+# logs/ 下最多保留最近多少次任务的报告（run_*.json 与 .prof）
+MAX_RUN_REPORTS = 50
+
+def prune_run_reports(log_dir=LOG_DIR, keep=MAX_RUN_REPORTS):
+    """
+    只保留最近 keep 次任务的 run_*.json / run_*.prof，更早的删除。
+    文件名以时间开头，按文件名排序即按时间排序。
+    """
+    runs = {}
+    for path in glob.glob(os.path.join(log_dir, 'run_*')):
+        runs.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+    for name in sorted(runs)[:-keep] if keep else sorted(runs):
+        for path in runs[name]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.debug(f"删除旧报告 {path} 失败: {e}")
+
+@contextlib.contextmanager
+def instrumented_run(task, profile='none', log_dir=LOG_DIR):
+    """
+    包住一次任务：清空耗时统计，按需开启 cProfile（只统计当前线程）或 tracemalloc，
+    结束时（出错或取消也一样）写出 logs/run_<时间>_<任务>.json，cProfile 结果另存为同名 .prof，
+    只保留最近 MAX_RUN_REPORTS 次的报告。
+    产出的 dict 在任务结束后填好统计结果，供界面和命令行显示。
+    """
+    if profile not in PROFILE_MODES:
+        raise ValueError(f"未知的性能分析方式: {profile}")
+    enable_file_logging(log_dir)
+    # 日志文件只在第一次任务时打开，之后换了工作目录也要能写出报告
+    os.makedirs(log_dir, exist_ok=True)
+    timings.reset()
+    report_base = os.path.join(log_dir, f"run_{time.strftime('%Y%m%d_%H%M%S')}_{task}")
+    run = {'task': task, 'started': time.strftime('%Y-%m-%d %H:%M:%S'), 'profile': profile}
+
+    profiler = tracemalloc = None
+    if profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start()
+
+    logger.debug(f"开始任务: {task}")
+    start = time.perf_counter()
+    run['status'] = 'error'
+    try:
+        yield run
+        run['status'] = 'done'
+    except JobCancelled:
+        run['status'] = 'cancelled'
+        raise
+    finally:
+        run['seconds'] = round(time.perf_counter() - start, 3)
+        run.update(timings.summary())
+        if profiler is not None:
+            profiler.disable()
+            run['profile_file'] = report_base + '.prof'
+            profiler.dump_stats(run['profile_file'])
+        if tracemalloc is not None:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            run['tracemalloc'] = {
+                'peak_mb': round(peak / 1024 / 1024, 2),
+                'top': [str(stat) for stat in snapshot.statistics('lineno')[:10]],
+            }
+        run['report_file'] = report_base + '.json'
+        with open(run['report_file'], 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=4, ensure_ascii=False)
+        prune_run_reports(log_dir)
+        logger.info(format_run_report(run))
+
+def _short_item_name(entry):
+    """
+    只显示最后两级路径，笔刷包里的材质都叫 Shape.png，需要带上所在的笔刷目录才分得清；
+    来自压缩包的成员前面再加上压缩包名。
+    """
+    name = '/'.join(entry['item'].replace(os.sep, '/').split('/')[-2:])
+    return f"{entry['archive']}: {name}" if entry.get('archive') else name
+
+def format_run_report(run):
+    """
+    多行的耗时报告：各阶段耗时和最慢的文件。
+    """
+    lines = [f"\n>>> 任务 {run['task']} 用时 {run['seconds']:.2f}s，报告已保存到 {run['report_file']}"]
+    for stage, stats in run['stages'].items():
+        lines.append(f"    {stage:<8} {stats['count']:>5} 次  共 {stats['seconds']:.3f}s  最长 {stats['max_seconds']:.3f}s")
+    if run['slowest_items']:
+        lines.append("    最慢的文件：")
+        for entry in run['slowest_items']:
+            lines.append(f"      {entry['seconds']:.3f}s  {_short_item_name(entry)}")
+    if run.get('profile_file'):
+        lines.append(f"    cProfile 结果: {run['profile_file']}")
+    if run.get('tracemalloc'):
+        lines.append(f"    tracemalloc 峰值: {run['tracemalloc']['peak_mb']} MB")
+    return "\n".join(lines)
+
+def summarize_run(run):
+    """
+    一行的摘要，显示在界面的状态栏。
+    """
+    parts = [f"用时 {run['seconds']:.2f}s"]
+    stages = list(run['stages'].items())[:3]
+    if stages:
+        parts.append("最耗时: " + " / ".join(f"{stage} {stats['seconds']:.2f}s" for stage, stats in stages))
+    if run['slowest_items']:
+        slowest = run['slowest_items'][0]
+        parts.append(f"最慢文件: {_short_item_name(slowest)} {slowest['seconds']:.2f}s")
+    return "，".join(parts)
+
+
+############################################################
+#        10) 材质索引（texture_shape/texture_index.db）
+############################################################
+
+# 解析得到的每张材质都记录在 texture_shape/texture_index.db（SQLite）中，
+# 查找材质（例如所有 1024 的 grain）直接查库，不用遍历目录、打开图片。
+# 只有解析（parse）输出的原始材质进索引；一键转换（convert）输出的 BMP 已经缩放、反相过，不建索引
+INDEX_DB_NAME = 'texture_index.db'
+INDEX_SCHEMA_VERSION = 2
+INDEX_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+TEXTURE_KINDS = ('shape', 'grain', 'other')
+
+# 版本变化时整张表重建（索引只是 texture_shape/ 的派生数据，运行 index 命令即可补回）；
+# 版本 1 的 needs_invert 混入了笔刷名的提示
+INDEX_SCHEMA = """
+DROP TABLE IF EXISTS textures;
+CREATE TABLE IF NOT EXISTS textures (
+    path TEXT PRIMARY KEY,     -- 相对于索引所在目录，如 <笔刷名>/<笔刷名>_s1.png
+    brushset TEXT NOT NULL,
+    uuid TEXT,                 -- 笔刷在 .brushset 中的目录名
+    kind TEXT NOT NULL,        -- shape / grain / other
+    width INTEGER,
+    height INTEGER,
+    side INTEGER,              -- 长边
+    content_hash TEXT,         -- 文件内容的 SHA-1
+    needs_invert INTEGER,      -- 1 为白底、需要反相（见 needs_invert_file）
+    params TEXT,               -- 换算后的 INI 参数（JSON），没有时为 NULL
+    file_size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS textures_kind_side ON textures (kind, side);
+CREATE INDEX IF NOT EXISTS textures_brushset ON textures (brushset);
+CREATE INDEX IF NOT EXISTS textures_hash ON textures (content_hash);
+PRAGMA user_version = 2;
+"""
+
+def open_texture_index(db_path):
+    """
+    打开（必要时创建）材质索引。多个进程同时写入时 SQLite 会加锁，这里最多等 30 秒。
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_SCHEMA_VERSION:
+        conn.executescript(INDEX_SCHEMA)
+    return conn
+
+def texture_kind(file_name, brushset):
+    """
+    根据 copy_files_to_new_folder 的命名（<笔刷名>_s1 / <笔刷名>_g1）判断材质类型。
+    """
+    stem = os.path.splitext(file_name)[0]
+    if stem.startswith(f"{brushset}_"):
+        suffix = stem[len(brushset) + 1:]
+        if suffix[1:].isdigit():
+            if suffix[0] == 's':
+                return 'shape'
+            if suffix[0] == 'g':
+                return 'grain'
+    return 'other'
+
+def describe_texture(file_path, content_hash=None):
+    """
+    读取一张材质的尺寸、内容指纹以及是否白底，返回 (宽, 高, SHA-1, 是否需要反相)。
+    已知 SHA-1 时不再读取整个文件；尺寸只读文件头；白底判断有缓存时不解码。
+    """
+    with timed('index', file_path):
+        if content_hash is None:
+            content_hash = file_content_key(file_path, use_hash=True)[1]
+        with Image.open(file_path) as img:
+            width, height = img.size
+        needs_invert = needs_invert_file(file_path, content_hash)
+    return width, height, content_hash, needs_invert
+
+def indexed_file_hashes(folder, db_path=None):
+    """
+    返回索引中 texture_shape/<笔刷名>/ 下各文件记录的 {文件名: (大小, 修改时间, SHA-1)}，
+    索引还不存在时返回空字典。
+    """
+    folder = os.path.normpath(folder)
+    if db_path is None:
+        db_path = os.path.join(os.path.dirname(folder), INDEX_DB_NAME)
+    if not os.path.exists(db_path):
+        return {}
+    with contextlib.closing(open_texture_index(db_path)) as conn:
+        return {
+            row['path'].rsplit('/', 1)[-1]: (row['file_size'], row['mtime_ns'], row['content_hash'])
+            for row in conn.execute(
+                'SELECT path, file_size, mtime_ns, content_hash FROM textures WHERE brushset = ?',
+                (os.path.basename(folder),))
+        }
+
+def index_texture_folder(folder, uuids=None, hashes=None, db_path=None):
+    """
+    把 texture_shape/<笔刷名>/ 下的材质写入索引（默认为上一级目录中的 texture_index.db），
+    并删掉该文件夹中已不存在的文件的记录。
+    uuids 为 {文件名: 笔刷 UUID}，没有提供时保留索引中原有的值；
+    hashes 为 {文件名: SHA-1}（复制时已经算好的），没有的文件才重新计算。
+    大小和修改时间都没变的文件不重新读取，只更新 UUID 和参数。
+    先读完所有改动过的文件，再在一个短事务里写入，读文件期间不占着数据库的写锁。
+    返回重新读取的文件数。
+    """
+    folder = os.path.normpath(folder)
+    brushset = os.path.basename(folder)
+    if db_path is None:
+        db_path = os.path.join(os.path.dirname(folder), INDEX_DB_NAME)
+    db_dir = os.path.dirname(os.path.abspath(db_path))
+    uuids = uuids or {}
+    hashes = hashes or {}
+    brush_params = load_brush_params_file(folder)
+
+    with contextlib.closing(open_texture_index(db_path)) as conn:
+        known = {
+            row['path']: (row['file_size'], row['mtime_ns'])
+            for row in conn.execute(
+                'SELECT path, file_size, mtime_ns FROM textures WHERE brushset = ?', (brushset,))
+        }
+        present = set()
+        unchanged = []
+        changed = []
+        for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(INDEX_EXTENSIONS):
+                continue
+            path = os.path.relpath(os.path.abspath(entry.path), db_dir).replace(os.sep, '/')
+            present.add(path)
+            params = brush_params.get(os.path.splitext(entry.name)[0])
+            params = json.dumps(params, sort_keys=True) if params else None
+            stat = entry.stat()
+            if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                unchanged.append((uuids.get(entry.name), params, path))
+                continue
+
+            width, height, content_hash, needs_invert = describe_texture(entry.path, hashes.get(entry.name))
+            changed.append((path, brushset, uuids.get(entry.name), texture_kind(entry.name, brushset),
+                            width, height, max(width, height), content_hash,
+                            int(needs_invert), params,
+                            stat.st_size, stat.st_mtime_ns))
+
+        with conn:
+            conn.executemany('UPDATE textures SET uuid = COALESCE(?, uuid), params = ? WHERE path = ?',
+                             unchanged)
+            conn.executemany(
+                'INSERT INTO textures (path, brushset, uuid, kind, width, height, side, content_hash,'
+                ' needs_invert, params, file_size, mtime_ns)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (path) DO UPDATE SET uuid = COALESCE(excluded.uuid, uuid),'
+                ' kind = excluded.kind, width = excluded.width, height = excluded.height,'
+                ' side = excluded.side, content_hash = excluded.content_hash,'
+                ' needs_invert = excluded.needs_invert, params = excluded.params,'
+                ' file_size = excluded.file_size, mtime_ns = excluded.mtime_ns',
+                changed
+            )
+            conn.executemany('DELETE FROM textures WHERE path = ?',
+                             [(path,) for path in known if path not in present])
+    invert_verdicts.flush()
+    logger.debug(f"材质索引已更新: {brushset}（重新读取 {len(changed)} 张）")
+    return len(changed)
+
+def rebuild_texture_index(root='./texture_shape'):
+    """
+    为 root 下的每个笔刷文件夹更新索引，并删除已不存在的文件夹的记录。
+    用于给旧版本生成的 texture_shape/ 补建索引，或文件被手动改动之后。
+    返回索引中的材质总数。
+    """
+    folders = sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+    for folder in folders:
+        raise_if_cancelled()
+        index_texture_folder(folder)
+
+    db_path = os.path.join(root, INDEX_DB_NAME)
+    names = [os.path.basename(folder) for folder in folders]
+    with contextlib.closing(open_texture_index(db_path)) as conn, conn:
+        conn.execute(f"DELETE FROM textures WHERE brushset NOT IN ({', '.join('?' * len(names))})",
+                     names)
+        total = conn.execute('SELECT COUNT(*) FROM textures').fetchone()[0]
+    logger.info(f"材质索引已更新：{len(folders)} 个笔刷文件夹，共 {total} 张材质 -> {db_path}")
+    return total
+
+def search_textures(root='./texture_shape', kind=None, size=None, brushset=None, needs_invert=None,
+                    content_hash=None, limit=None):
+    """
+    在 root 下的材质索引中查找材质，条件为 None 的不限制：
+        kind: shape / grain / other
+        size: 长边的像素数
+        brushset: 笔刷名中包含的文字
+        needs_invert: True 只找白底的，False 只找黑底的
+        content_hash: 文件内容的 SHA-1
+    返回 [{列名: 值}, ...]，path 换成了可以直接打开的路径，params 解析为字典。
+    """
+    db_path = os.path.join(root, INDEX_DB_NAME)
+    if not os.path.exists(db_path):
+        return []
+    clauses = []
+    values = []
+    for column, value in (('kind', kind), ('side', size), ('content_hash', content_hash)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            values.append(value)
+    if needs_invert is not None:
+        clauses.append('needs_invert = ?')
+        values.append(int(needs_invert))
+    if brushset:
+        # 用 instr 而不是 LIKE：笔刷名中的 _ 和 % 按普通字符匹配
+        clauses.append('instr(brushset, ?) > 0')
+        values.append(brushset)
+    query = 'SELECT * FROM textures'
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += ' ORDER BY brushset, path'
+    if limit:
+        query += ' LIMIT ?'
+        values.append(limit)
+
+    with contextlib.closing(open_texture_index(db_path)) as conn:
+        rows = [dict(row) for row in conn.execute(query, values)]
+    for row in rows:
+        row['path'] = os.path.join(root, *row['path'].split('/'))
+        row['needs_invert'] = bool(row['needs_invert'])
+        row['params'] = json.loads(row['params']) if row['params'] else None
+    return rows
+
+
+############################################################
+#        11) 监视文件夹：新放入的笔刷和图片自动处理
+############################################################
+
+# 扫描时跳过的目录：本程序的输出目录，输出的文件不会被当成新文件再处理一遍
+WATCH_EXCLUDED_DIRS = ('bmp', 'cache', 'texture_shape', 'logs')
+WATCH_EXCLUDED_PREFIXES = ('compress_', 'crop_')
+# 已处理文件的记录，保存在被监视的文件夹中，重新启动后不会重复处理
+WATCH_STATE_FILE_NAME = 'watch_state.json'
+
+def snapshot_watch_folder(folder):
+    """
+    返回 folder 下（跳过输出目录）所有 .brushset 与可转换图片的 {路径: (大小, 修改时间)}。
+    只读取目录项，不打开文件。
+    """
+    snapshot = {}
+    pending = [folder]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue  # 扫描时目录被删除或移走
+        for entry in entries:
+            if entry.is_dir():
+                if entry.name not in WATCH_EXCLUDED_DIRS and not entry.name.startswith(WATCH_EXCLUDED_PREFIXES):
+                    pending.append(entry.path)
+                continue
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext != '.brushset' and ext not in SUPPORTED_FORMATS:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+class FolderWatcher:
+    """
+    轮询监视一个文件夹：新放入或有改动的 .brushset 交给 parse_brushsets（输出到 cache/ 与 texture_shape/），
+    图片交给 convert_png_to_bmp（输出到 <文件夹>/bmp/<子文件夹>/，保留原来的目录结构，并生成 INI）。
+    文件在 settle 秒内没有再变化才处理，正在复制的文件不会只处理一半；
+    同一轮扫描中就绪的文件一起处理。处理过的文件记录在 watch_state.json 中。
+    """
+    def __init__(self, folder, settle=3.0, max_size=1024, jobs=None,
+                 quality=DEFAULT_RESIZE_QUALITY, normalize=DEFAULT_NORMALIZE_MODE):
+        self.folder = folder
+        self.settle = settle
+        self.max_size = max_size
+        self.jobs = jobs
+        self.quality = quality
+        self.normalize = normalize
+        self.state_path = os.path.join(folder, WATCH_STATE_FILE_NAME)
+        self.processed = self._load_state()  # 路径 -> 处理时的 (大小, 修改时间)
+        self.pending = {}  # 路径 -> ((大小, 修改时间), 第一次看到这个状态的时间)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {os.path.join(self.folder, *path.split('/')): tuple(signature)
+                for path, signature in state.items()}
+
+    def _save_state(self):
+        state = {os.path.relpath(path, self.folder).replace(os.sep, '/'): list(signature)
+                 for path, signature in sorted(self.processed.items())}
+        # 先写临时文件再替换，中途退出也不会留下损坏的记录
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def mark_existing(self):
+        """
+        把文件夹中现有的文件都记为已处理，之后只处理新放入的文件。
+        """
+        self.processed = snapshot_watch_folder(self.folder)
+        self.pending.clear()
+        self._save_state()
+
+    def poll(self, now=None, settle=None):
+        """
+        扫描一次，返回 (已就绪的新文件或有改动的文件, 本次扫描结果)。
+        """
+        now = time.monotonic() if now is None else now
+        settle = self.settle if settle is None else settle
+        snapshot = snapshot_watch_folder(self.folder)
+
+        ready = []
+        for path, signature in snapshot.items():
+            if self.processed.get(path) == signature:
+                self.pending.pop(path, None)
+                continue
+            seen = self.pending.get(path)
+            if seen is None or seen[0] != signature:
+                # 第一次看到，或者还在变化（正在复制），重新计时
+                seen = self.pending[path] = (signature, now)
+            if now - seen[1] >= settle:
+                ready.append(path)
+
+        # 已被删除的文件不再记录
+        for mapping in (self.pending, self.processed):
+            for path in [path for path in mapping if path not in snapshot]:
+                del mapping[path]
+        return sorted(ready), snapshot
+
+    def process(self, paths, snapshot):
+        """
+        处理一批就绪的文件，然后记为已处理（失败的也记下，文件再次改动后才重试）。
+        """
+        brushsets = [path for path in paths if path.lower().endswith('.brushset')]
+        images = [path for path in paths if not path.lower().endswith('.brushset')]
+        if brushsets:
+            logger.info(f"\n>>> 发现 {len(brushsets)} 个新的或有改动的笔刷文件，开始解析")
+            errors = parse_brushsets(brushsets, max_workers=self.jobs)
+            for filename, error in errors.items():
+                logger.error(f"[失败] {filename}: {error}")
+        if images:
+            logger.info(f"\n>>> 发现 {len(images)} 张新的或有改动的图片，开始转换")
+            self.convert_images(images)
+
+        for path in paths:
+            self.processed[path] = snapshot[path]
+            self.pending.pop(path, None)
+        self._save_state()
+
+    def convert_images(self, images):
+        """
+        按所在子文件夹分组转换：<文件夹>/a/x.png -> <文件夹>/bmp/a/x.bmp，
+        不同子文件夹中的同名图片不会写到同一个 BMP。
+        同一子文件夹中主文件名相同的图片（x.png 与 x.jpg）只转换按文件名排序的最后一个。
+        只为这一批写出的 BMP 生成 INI，不动 bmp/ 中的其他文件。
+        """
+        bmp_root = os.path.join(self.folder, 'bmp')
+        groups = {}  # 子文件夹 -> {主文件名: 图片路径}
+        for path in sorted(images):
+            by_name = groups.setdefault(os.path.dirname(path), {})
+            base_filename = os.path.splitext(os.path.basename(path))[0]
+            if base_filename in by_name:
+                logger.warning(f"同名文件 {base_filename}，跳过 {by_name[base_filename]}，只转换: {path}")
+            by_name[base_filename] = path
+
+        for source_dir, by_name in sorted(groups.items()):
+            target_dir = os.path.normpath(os.path.join(bmp_root, os.path.relpath(source_dir, self.folder)))
+            results = convert_png_to_bmp(source_dir, target_dir, self.max_size, self.jobs,
+                                         quality=self.quality, normalize=self.normalize,
+                                         image_files=sorted(by_name.values()))
+            bmp_files = [converted_bmp_path(file_path, target_dir, status) for file_path, status, _ in results]
+            copy_ini_files([path for path in bmp_files if path], 'default.ini',
+                           load_brush_params_file(source_dir))
+
+def watch_folders(folders, interval=2.0, once=False, skip_existing=False, profile='none',
+                  stop_event=None, **options):
+    """
+    每 interval 秒扫描一次 folders，直到 stop_event 被设置（命令行中按 Ctrl+C）。
+    once=True 时不等待文件稳定，处理完现有的新文件就返回；
+    skip_existing=True 时启动时已有的文件都不处理。
+    每批文件单独生成一份耗时报告（见 instrumented_run）。options 传给 FolderWatcher。
+    """
+    stop_event = stop_event or threading.Event()
+    watchers = [FolderWatcher(folder, **options) for folder in folders]
+    if skip_existing:
+        for watcher in watchers:
+            watcher.mark_existing()
+    if not once:
+        logger.info(f"开始监视 {', '.join(folders)}（每 {interval}s 扫描一次，按 Ctrl+C 停止）")
+
+    while True:
+        for watcher in watchers:
+            ready, snapshot = watcher.poll(settle=0 if once else None)
+            if ready:
+                with instrumented_run('watch', profile):
+                    watcher.process(ready, snapshot)
+        if once or stop_event.wait(interval):
+            return
 
 
 ############################################################
 #                     Tkinter 界面
 ############################################################
 
-def browse_brushset(progress_label, progress_bar):
+def browse_brushset(job_runner):
     """
     解析 .brushset 文件，只提取 .png & .archive，
     并复制图像文件到 texture_shape 文件夹
@@ -367,24 +2456,51 @@ def browse_brushset(progress_label, progress_bar):
     if not filenames:
         return
 
-    for filename in filenames:
-        parser = BrushsetParser(
-            filename,
-            progress_callback=lambda prog: update_progress(prog, progress_label, progress_bar)
-        )
-        if parser.check():
-            messagebox.showinfo("Info", f"开始解析：{os.path.basename(filename)}")
-            parser.parse()
+    def on_done(errors):
+        succeeded = len(filenames) - len(errors)
+        if errors:
+            error_lines = "\n".join(f"{os.path.basename(f)}: {err}" for f, err in errors.items())
+            messagebox.showerror(
+                "Error",
+                f"解析完成 {succeeded} 个，失败 {len(errors)} 个：\n{error_lines}"
+            )
+        else:
             messagebox.showinfo(
                 "Success",
-                f"解析已完成: {os.path.basename(filename)}\n"
+                f"解析已完成: {succeeded} 个笔刷文件\n"
                 f"请查看 cache/ 与 texture_shape/ 文件夹。"
             )
-            reset_progress(progress_label, progress_bar)
+
+    job_runner.submit(
+        parse_brushsets,
+        filenames,
+        progress_callback=job_runner.report_progress,
+        on_done=on_done
+    )
+
+def browse_brushset_to_sai(job_runner):
+    """
+    选择 .brushset 文件，一步生成 texture_shape/<笔刷名>/bmp/ 下的 BMP 和 INI
+    """
+    filenames = filedialog.askopenfilenames(filetypes=[("Procreate Brushset", "*.brushset")])
+    if not filenames:
+        return
+
+    def on_done(errors):
+        if errors:
+            error_lines = "\n".join(f"{os.path.basename(f)}: {err}" for f, err in errors.items())
+            messagebox.showerror("Error", f"以下笔刷转换失败：\n{error_lines}")
         else:
-            messagebox.showerror("Error", f"{os.path.basename(filename)} 不是有效的 .brushset 文件。")
+            messagebox.showinfo("Success", "一键转换完成，请查看 texture_shape/<笔刷名>/bmp/ 文件夹。")
 
-def browse_folders_for_bmp_and_ini():
+    job_runner.submit(
+        convert_brushsets_to_sai,
+        filenames,
+        progress_callback=job_runner.report_progress,
+        on_done=on_done
+    )
+
+def browse_folders_for_bmp_and_ini(job_runner):
     """
     允许用户多次选择文件夹；对每个文件夹中的 .png 文件进行 BMP 转换，
     然后对生成的 BMP 文件复制 & 重命名 .ini 文件（如果不存在）。
@@ -399,65 +2515,299 @@ def browse_folders_for_bmp_and_ini():
     if not selected_folders:
         return  # 用户没有选择任何文件夹
 
-    for folder in selected_folders:
-        # 第一步：PNG -> BMP
-        bmp_target_dir = os.path.join(folder, 'bmp')
-        convert_png_to_bmp(folder, bmp_target_dir)
-
-        # 可选：再次压缩 WRONGSIZE
-        wrong_size_dir = os.path.join(bmp_target_dir, 'WRONGSIZE')
-        resize_bmp_images(wrong_size_dir)
+    job_runner.submit(
+        convert_folders_to_bmp_and_ini,
+        selected_folders,
+        progress_callback=job_runner.report_progress,
+        on_done=lambda _: messagebox.showinfo(
+            "Success", "BMP 转换 + INI 复制已完成，请查看每个所选文件夹下的 bmp/ 子目录。")
+    )
 
-        # 第二步：为生成的 BMP 文件复制对应 .ini
-        assign_ini_to_bmp_in_folder(bmp_target_dir)
 
-    messagebox.showinfo("Success", "BMP 转换 + INI 复制已完成，请查看每个所选文件夹下的 bmp/ 子目录。")
+# 白底判断先把整张图缩小到长边约 INVERT_CLASSIFY_SIZE 像素再统计
+INVERT_CLASSIFY_SIZE = 128
+# 判断方法或缓存的内容改变时加一，缓存中旧版本的结果自动作废
+INVERT_CLASSIFIER_VERSION = 3
+TRANSPARENT_LUT = [255 if v < 128 else 0 for v in range(256)]
 
+def _histogram_stats(histogram):
+    """
+    返回 (亮度 > 200 的占比, 亮度 < 55 的占比, 平均亮度)，没有像素时返回 None。
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    mean = sum(level * count for level, count in enumerate(histogram)) / total
+    return sum(histogram[201:]) / total, sum(histogram[:55]) / total, mean
 
-def should_invert_image(img):
+def should_invert_image(img, prefer_invert=False):
     """
-    通过分析图像四边5像素宽度区域的像素来判断是否需要反转。
-    如果四边的白色像素（亮度>200）占比超过60%，则认为是白底图片。
+    判断是否为白底黑图（见 classify_background），prefer_invert 见 apply_invert_hint。
     返回 True 如果是白底黑图（需要反转），False 如果是黑底白图（不需要反转）。
     """
-    # 转换为灰度图像
-    if img.mode != 'L':
-        img = img.convert('L')
-    
-    width, height = img.size
-    pixels = img.load()
-    edge_width = 5  # 检测边缘的宽度
-    
-    # 收集四边的像素
-    edge_pixels = []
-    
-    # 上边 5 像素
-    for y in range(edge_width):
-        edge_pixels.extend([pixels[x, y] for x in range(width)])
-    
-    # 下边 5 像素
-    for y in range(height - edge_width, height):
-        edge_pixels.extend([pixels[x, y] for x in range(width)])
-    
-    # 左边 5 像素（不包括已经计算的角落）
-    for x in range(edge_width):
-        edge_pixels.extend([pixels[x, y] for y in range(edge_width, height - edge_width)])
-    
-    # 右边 5 像素（不包括已经计算的角落）
-    for x in range(width - edge_width, width):
-        edge_pixels.extend([pixels[x, y] for y in range(edge_width, height - edge_width)])
-    
-    # 计算白色像素（亮度>200）的比例
-    white_pixels = sum(1 for p in edge_pixels if p > 200)
-    white_ratio = white_pixels / len(edge_pixels)
-    
-    # 如果白色像素占比超过60%，认为是白底图片
-    is_white_background = white_ratio > 0.6
-    print(f"白色像素占比: {white_ratio:.2%}")
-    
-    return is_white_background
+    return apply_invert_hint(classify_background(img), prefer_invert)
+
+def apply_invert_hint(verdict, prefer_invert=False):
+    """
+    verdict 为 classify_background 的结果；只靠第 4 步（平均亮度）判断时，
+    prefer_invert（如笔刷名注明需反色）为 True 则按白底处理。
+    """
+    needs_invert, ambiguous = verdict
+    if ambiguous and prefer_invert:
+        logger.debug("图片本身判断不出底色，按笔刷名的提示反相")
+        return True
+    return needs_invert
+
+def classify_background(img):
+    """
+    判断是否为白底黑图。整张图先隔点取样缩小到长边约 128 像素，再按以下顺序用直方图统计：
+      1. 有透明区域（5% 以上的像素 alpha < 128）时透明区域就是背景，
+         它转成灰度后（转换 BMP 时同样忽略 alpha）亮度 > 200 的超过 60% 为白底；
+      2. 四周一圈（边长的 1/16）亮度 > 200 的超过 60% 为白底，< 55 的超过 60% 为黑底；
+      3. 四周不明确（图案铺到了边缘）时，内容通常集中在中间：四周比中心亮 40 以上为白底，暗 40 以上为黑底；
+      4. 仍不明确时整张图的平均亮度超过一半为白底。
+    返回 (是否为白底, 是否只靠第 4 步判断)。
+    """
+    # 隔点取样缩小（不混合相邻像素，透明区域的颜色不会被 alpha 预乘成黑色），再转换小图
+    factor = max(1, max(img.size) // INVERT_CLASSIFY_SIZE)
+    if factor > 1:
+        img = img.resize((max(1, img.width // factor), max(1, img.height // factor)),
+                         Image.Resampling.NEAREST)
+    if img.mode in ('L', 'LA', 'RGB', 'RGBA'):
+        small = img
+    else:
+        has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+        small = img.convert('RGBA' if has_alpha else 'L')
+    gray = small if small.mode == 'L' else small.convert('L')
+    width, height = gray.size
+
+    if 'A' in small.getbands():
+        transparent = small.getchannel('A').point(TRANSPARENT_LUT)
+        stats = _histogram_stats(gray.histogram(transparent))
+        if stats and sum(transparent.histogram()[255:]) >= 0.05 * width * height:
+            logger.debug(f"透明区域白色像素占比: {stats[0]:.2%}")
+            return stats[0] > 0.6, False
+
+    border = max(1, min(width, height) // 16)
+    if width > 2 * border and height > 2 * border:
+        border_mask = Image.new('L', gray.size, 255)
+        border_mask.paste(0, (border, border, width - border, height - border))
+        border_stats = _histogram_stats(gray.histogram(border_mask))
+    else:
+        border_stats = _histogram_stats(gray.histogram())
+    white_ratio, black_ratio, border_mean = border_stats
+    logger.debug(f"四周白色像素占比: {white_ratio:.2%}，黑色像素占比: {black_ratio:.2%}")
+    if white_ratio > 0.6:
+        return True, False
+    if black_ratio > 0.6:
+        return False, False
+
+    center_box = (width // 4, height // 4, width - width // 4, height - height // 4)
+    center_mean = _histogram_stats(gray.crop(center_box).histogram())[2]
+    if border_mean - center_mean > 40:
+        return True, False
+    if center_mean - border_mean > 40:
+        return False, False
+    return _histogram_stats(gray.histogram())[2] > 127, True
+
+# 笔刷名中注明了需要反相的 .brushset（如“诚夏_星星和爱心笔刷_需反色”）：
+# 一键转换的 auto 模式下，图片本身判断不出底色时按白底处理（见 apply_invert_hint）
+INVERT_NAME_HINTS = ('需反色', '需要反色', '需反相', '需要反相')
+
+def brushset_needs_invert(name):
+    return any(hint in name for hint in INVERT_NAME_HINTS)
+
+def program_dir():
+    """
+    程序所在的文件夹：打包后为 exe 所在目录，否则为脚本所在目录。
+    """
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+# 白底判断结果的缓存文件：默认放在程序目录的 cache/ 下，不随启动时的工作目录变化；
+# 可用环境变量 PRCT2SAI_VERDICT_CACHE 或命令行 --verdict-cache 指定其他文件，设为 off 时不缓存
+DEFAULT_VERDICT_DB_PATH = os.path.join(program_dir(), 'cache', 'invert_verdicts.db')
+VERDICT_CACHE_ENV = 'PRCT2SAI_VERDICT_CACHE'
+# 积攒多少条新结果写一次数据库
+VERDICT_FLUSH_SIZE = 256
+
+def parse_verdict_cache_path(value):
+    """
+    --verdict-cache / PRCT2SAI_VERDICT_CACHE 的值：off（或空）表示不缓存，返回 None，否则返回文件路径。
+    """
+    if value is None or value.strip().lower() in ('', 'off', 'none', '0'):
+        return None
+    return value
 
-def invert_selected_image_files(auto_detect=False):
+class VerdictCache:
+    """
+    白底判断结果的持久缓存：文件内容的 SHA-1 -> (是否为白底, 是否只靠平均亮度判断)，
+    保存在 SQLite 中，多个进程可以同时使用。db_path 为 None 时不缓存。
+    第一次用到时把当前版本（INVERT_CLASSIFIER_VERSION）的全部结果读进内存，之后查询不再访问磁盘。
+    每个进程只打开一个连接；新结果先留在内存中，攒够 VERDICT_FLUSH_SIZE 条或调用 flush() 时一次写入。
+    """
+    def __init__(self, db_path=DEFAULT_VERDICT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._verdicts = None
+        self._pending = {}
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # fork 出的子进程不能沿用父进程的连接，父进程还没写入的结果也由父进程自己写
+        if self._pid != os.getpid():
+            self._conn = None
+            self._pending = {}
+            self._pid = os.getpid()
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            with self._conn:
+                self._conn.execute('CREATE TABLE IF NOT EXISTS verdicts (content_hash TEXT PRIMARY KEY,'
+                                   ' needs_invert INTEGER NOT NULL, version INTEGER NOT NULL,'
+                                   ' ambiguous INTEGER NOT NULL DEFAULT 0)')
+                columns = {row[1] for row in self._conn.execute('PRAGMA table_info(verdicts)')}
+                if 'ambiguous' not in columns:  # 版本 2 的缓存没有这一列
+                    self._conn.execute('ALTER TABLE verdicts ADD COLUMN ambiguous INTEGER NOT NULL DEFAULT 0')
+        return self._conn
+
+    def get(self, content_hash):
+        if self.db_path is None:
+            return None
+        with self._lock:
+            if self._verdicts is None:
+                self._verdicts = {
+                    row[0]: (bool(row[1]), bool(row[2])) for row in self._connection().execute(
+                        'SELECT content_hash, needs_invert, ambiguous FROM verdicts WHERE version = ?',
+                        (INVERT_CLASSIFIER_VERSION,))
+                }
+            return self._verdicts.get(content_hash)
+
+    def put(self, content_hash, verdict):
+        if self.db_path is None:
+            return
+        with self._lock:
+            conn = self._connection()
+            if self._verdicts is not None:
+                self._verdicts[content_hash] = verdict
+            self._pending[content_hash] = verdict
+            if len(self._pending) >= VERDICT_FLUSH_SIZE:
+                self._write_pending(conn)
+
+    def flush(self):
+        """
+        把内存中的新结果写入数据库。一批文件处理完后调用。
+        """
+        if self.db_path is None:
+            return
+        with self._lock:
+            if self._pending:
+                self._write_pending(self._connection())
+
+    def _write_pending(self, conn):
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO verdicts (content_hash, needs_invert, version, ambiguous)'
+                ' VALUES (?, ?, ?, ?)',
+                [(content_hash, int(needs_invert), INVERT_CLASSIFIER_VERSION, int(ambiguous))
+                 for content_hash, (needs_invert, ambiguous) in self._pending.items()])
+        self._pending.clear()
+
+invert_verdicts = VerdictCache(parse_verdict_cache_path(os.environ.get(VERDICT_CACHE_ENV, DEFAULT_VERDICT_DB_PATH)))
+
+def set_verdict_cache(db_path):
+    """
+    改用 db_path 缓存白底判断结果，None 表示不缓存。
+    命令行 --verdict-cache 和进程池的初始化（子进程沿用主进程的设置）会调用。
+    """
+    global invert_verdicts
+    if db_path != invert_verdicts.db_path:
+        invert_verdicts.flush()
+        invert_verdicts = VerdictCache(db_path)
+
+def cached_background_verdict(content_hash, classify):
+    """
+    按内容 SHA-1 查缓存，没有时调用 classify()（返回 classify_background 的结果）并记入缓存。
+    """
+    verdict = invert_verdicts.get(content_hash)
+    if verdict is None:
+        verdict = classify()
+        invert_verdicts.put(content_hash, verdict)
+    return verdict
+
+def needs_invert_file(file_path, content_hash=None):
+    """
+    图片文件是否为白底（需要反相）。结果按文件内容的 SHA-1 缓存，
+    同样内容的文件（重复运行、或复制到别处的同一张图）只读取文件算指纹，不再解码。
+    """
+    if content_hash is None:
+        content_hash = file_content_key(file_path, use_hash=True)[1]
+
+    def classify():
+        with Image.open(file_path) as img:
+            # 如果是动图，只取第一帧
+            if hasattr(img, 'is_animated') and img.is_animated:
+                img.seek(0)
+            # JPEG 只解码到判断需要的分辨率
+            draft_for_size(img, (INVERT_CLASSIFY_SIZE, INVERT_CLASSIFY_SIZE))
+            return classify_background(img)
+
+    return cached_background_verdict(content_hash, classify)[0]
+
+# 反相查找表：只在加载时计算一次，所有图片共用
+INVERT_LUT = [255 - i for i in range(256)]
+IDENTITY_LUT = list(range(256))
+
+def _invert_pixel(p):
+    return 255 - p
+
+def invert_image(img):
+    """
+    反相图像，alpha 通道保持不变。
+    用预先计算好的查找表一次 point() 完成，不再拆分/合并通道。
+    """
+    bands = len(img.getbands())
+    if img.mode in ('L', '1', 'RGB', 'CMYK'):
+        return img.point(INVERT_LUT * bands)
+    if img.mode in ('LA', 'RGBA'):
+        return img.point(INVERT_LUT * (bands - 1) + IDENTITY_LUT)
+    if img.mode in ('P', 'PA'):
+        # 调色板图片只反相调色板，透明色索引不变
+        inverted = img.copy()
+        inverted.putpalette([255 - v for v in img.getpalette()])
+        return inverted
+    # I / I;16 / F 等模式不支持查找表，沿用逐值计算
+    return img.point(_invert_pixel)
+
+def invert_image_file(image_file, out_path, auto_detect=False):
+    """
+    反相单个图像文件并按原格式保存到 out_path。
+    auto_detect 时先用 needs_invert_file 判断（结果有缓存），只反相白底图片；
+    不需要反相的图片直接复制原文件，不解码也不重新编码。
+    返回是否进行了反相。
+    """
+    needs_invert = needs_invert_file(image_file) if auto_detect else True
+    if auto_detect:
+        filename = os.path.basename(image_file)
+        if needs_invert:
+            logger.info(f"检测到白底黑图，已反相：{filename}")
+        else:
+            logger.info(f"检测到黑底白图，保持原样：{filename}")
+    if not needs_invert:
+        shutil.copyfile(image_file, out_path)
+        return False
+
+    with Image.open(image_file) as img:
+        # 如果是动图，只取第一帧
+        if hasattr(img, 'is_animated') and img.is_animated:
+            img.seek(0)
+        # 保存时保持原始格式
+        invert_image(img).save(out_path, quality=95)
+    return True
+
+def invert_selected_image_files(job_runner, auto_detect=False):
     """
     允许用户多选图像文件，对每一个执行反相处理，
     结果保存到同目录下的 invert 或 auto_invert 子文件夹，保持原文件名和格式
@@ -476,57 +2826,49 @@ def invert_selected_image_files(auto_detect=False):
     if not image_paths:
         return
 
-    for image_file in image_paths:
-        src_dir = os.path.dirname(image_file)
-        # 根据是否为自动检测模式选择不同的输出目录
-        output_dir = "auto_invert" if auto_detect else "invert"
-        target_dir = os.path.join(src_dir, output_dir)
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
-
-        filename = os.path.basename(image_file)
-        out_path = os.path.join(target_dir, filename)
-
-        try:
-            with Image.open(image_file) as img:
-                # 转换为RGB或L模式进行处理
-                if img.mode in ['RGBA', 'LA']:
-                    # 保持alpha通道不变
-                    r, g, b, a = img.split()
-                    rgb_img = Image.merge('RGB', (r, g, b))
-                    if auto_detect:
-                        needs_invert = should_invert_image(rgb_img)
-                        if needs_invert:
-                            rgb_inverted = rgb_img.point(lambda p: 255 - p)
-                        else:
-                            rgb_inverted = rgb_img
-                    else:
-                        rgb_inverted = rgb_img.point(lambda p: 255 - p)
-                    # 重新合并alpha通道
-                    inverted_image = Image.merge('RGBA', (*rgb_inverted.split(), a))
-                else:
-                    # 对于其他格式的图片直接处理
-                    if auto_detect:
-                        needs_invert = should_invert_image(img)
-                        if needs_invert:
-                            inverted_image = img.point(lambda p: 255 - p)
-                        else:
-                            inverted_image = img.copy()
-                    else:
-                        inverted_image = img.point(lambda p: 255 - p)
-
-                # 保存时保持原始格式
-                inverted_image.save(out_path, quality=95)
-                print(f"已处理并保存：{out_path}")
-
-        except Exception as e:
-            print(f"处理文件 {filename} 时出错: {str(e)}")
-            continue
-
     success_msg = "所选图像文件处理完成，并存储到各自文件夹的 "
     success_msg += "auto_invert/" if auto_detect else "invert/"
     success_msg += " 子目录。"
-    messagebox.showinfo("完成", success_msg)
+    job_runner.submit(
+        invert_image_files,
+        image_paths,
+        auto_detect=auto_detect,
+        progress_callback=job_runner.report_progress,
+        on_done=lambda _: messagebox.showinfo("完成", success_msg)
+    )
+
+def invert_image_files(image_paths, auto_detect=False, progress_callback=None, output_dir_name=None):
+    """
+    对每个图像文件执行反相处理（auto_detect 时只反相白底图片），
+    结果保存到同目录下的 invert 或 auto_invert 子文件夹，保持原文件名和格式
+    """
+    # 根据是否为自动检测模式选择不同的输出目录
+    if output_dir_name is None:
+        output_dir_name = "auto_invert" if auto_detect else "invert"
+
+    # 取消或出错时也把已经算出的白底判断写入缓存
+    try:
+        for idx, image_file in enumerate(image_paths):
+            raise_if_cancelled()
+            if progress_callback:
+                progress_callback(idx / len(image_paths) * 100)
+
+            src_dir = os.path.dirname(image_file)
+            target_dir = os.path.join(src_dir, output_dir_name)
+            if not os.path.exists(target_dir):
+                os.makedirs(target_dir)
+
+            filename = os.path.basename(image_file)
+            out_path = os.path.join(target_dir, filename)
+
+            try:
+                invert_image_file(image_file, out_path, auto_detect)
+                logger.info(f"已处理并保存：{out_path}")
+            except Exception as e:
+                logger.error(f"处理文件 {filename} 时出错: {str(e)}")
+                continue
+    finally:
+        invert_verdicts.flush()
 
 
 def update_progress(progress, label, progress_bar):
@@ -538,7 +2880,7 @@ def reset_progress(label, progress_bar):
     progress_bar["value"] = 0
     label.config(text="进度: 0%")
 
-def auto_detect_and_invert_bmp_files():
+def auto_detect_and_invert_bmp_files(job_runner):
     """
     自动检测白底黑图并反转。
     支持的格式：PNG, JPG, JPEG, TIFF, BMP, GIF, WebP, PSD, ICO
@@ -562,60 +2904,26 @@ def auto_detect_and_invert_bmp_files():
     if not image_paths:
         return
 
-    for image_file in image_paths:
-        src_dir = os.path.dirname(image_file)
-        invert_dir = os.path.join(src_dir, "invert")
-        if not os.path.exists(invert_dir):
-            os.makedirs(invert_dir)
-
-        filename = os.path.basename(image_file)
-        out_path = os.path.join(invert_dir, filename)
-
-        try:
-            with Image.open(image_file) as img:
-                # 如果是动图，只取第一帧
-                if hasattr(img, 'is_animated') and img.is_animated:
-                    img.seek(0)
-                
-                # 处理带透明通道的图片
-                if img.mode in ['RGBA', 'LA']:
-                    r, g, b, a = img.split()
-                    rgb_img = Image.merge('RGB', (r, g, b))
-                    if should_invert_image(rgb_img):
-                        rgb_inverted = rgb_img.point(lambda p: 255 - p)
-                        inverted_image = Image.merge('RGBA', (*rgb_inverted.split(), a))
-                    else:
-                        inverted_image = img.copy()
-                else:
-                    # 对于其他格式的图片直接处理
-                    if should_invert_image(img):
-                        inverted_image = img.point(lambda p: 255 - p)
-                        print(f"检测到白底黑图，已反相：{filename}")
-                    else:
-                        inverted_image = img.copy()
-                        print(f"检测到黑底白图，保持原样：{filename}")
-
-                # 保存时保持原始格式
-                inverted_image.save(out_path, quality=95)
-                print(f"已保存到：{out_path}")
-
-        except Exception as e:
-            print(f"处理文件 {filename} 时出错: {str(e)}")
-            continue
+    job_runner.submit(
+        auto_detect_and_invert_image_files,
+        image_paths,
+        progress_callback=job_runner.report_progress,
+        on_done=lambda _: messagebox.showinfo(
+            "完成", "自动检测并反转完成，结果保存在各自文件夹的 invert/ 子目录。")
+    )
 
-    messagebox.showinfo("完成", "自动检测并反转完成，结果保存在各自文件夹的 invert/ 子目录。")
+def auto_detect_and_invert_image_files(image_paths, progress_callback=None):
+    """
+    只对检测为白底的图片进行反转处理，结果保存到同目录下的 invert 子文件夹。
+    """
+    invert_image_files(image_paths, auto_detect=True, progress_callback=progress_callback,
+                       output_dir_name="invert")
 
 def open_current_directory():
     """
     打开程序所在的文件夹
     """
-    if getattr(sys, 'frozen', False):
-        # 如果是打包后的 exe
-        current_dir = os.path.dirname(sys.executable)
-    else:
-        # 如果是 Python 脚本
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-    os.startfile(current_dir)
+    os.startfile(program_dir())
 
 def show_readme():
     """
@@ -700,63 +3008,121 @@ tohsakrat的github链接：https://github.com/tohsakrat/Brush-Converter
     y = (readme_window.winfo_screenheight() // 2) - (height // 2)
     readme_window.geometry(f'{width}x{height}+{x}+{y}')
 
-def compress_images(image_paths, target_size):
+# 压缩后按原格式保存时的编码参数（格式名同 Image.registered_extensions()）
+#   PNG：压缩级别 1，比默认的 6 快很多，文件只大一点；不做 optimize 的额外一遍
+#   JPEG：质量 95，明确使用 4:2:0 色度抽样（Pillow 的默认，编码最快）
+#   BMP：不压缩，直接写出像素
+ENCODER_OPTIONS = {
+    'PNG': {'compress_level': 1, 'optimize': False},
+    'JPEG': {'quality': 95, 'subsampling': '4:2:0', 'optimize': False},
+    'WEBP': {'quality': 95, 'method': 4},
+    'TIFF': {'compression': 'raw'},
+    'BMP': {},
+}
+
+def compress_image(image_path, output_dir, target_size, quality=DEFAULT_RESIZE_QUALITY):
+    """
+    把一张图片等比缩小到长边为 target_size，保存到 output_dir。
+    返回 'ok'，或者图片本来就不大于目标尺寸时返回 'skipped'。
+    Pillow 不能写出的格式（如 PSD）改存为同名 PNG；同目录下已有同名 PNG 时
+    （foo.psd 与 foo.png）保留原扩展名存为 foo.psd.png，两者的结果不会互相覆盖。
+    """
+    filename = os.path.basename(image_path)
+    base_name, ext = os.path.splitext(filename)
+    image_format = Image.registered_extensions().get(ext.lower())
+    if image_format not in Image.SAVE:
+        image_format = 'PNG'
+        if os.path.exists(os.path.join(os.path.dirname(image_path), f"{base_name}.png")):
+            filename = f"{filename}.png"
+        else:
+            filename = f"{base_name}.png"
+
+    # 打开并处理图片
+    with Image.open(image_path) as img:
+        # 如果是动图，只取第一帧
+        if hasattr(img, 'is_animated') and img.is_animated:
+            img.seek(0)
+        
+        # 获取原始尺寸
+        original_size = img.size
+        max_original_dimension = max(original_size)
+        
+        # 如果图片尺寸小于目标尺寸，跳过
+        if max_original_dimension <= target_size:
+            logger.info(f"跳过 {filename}: 原始尺寸 {original_size} 小于目标尺寸 {target_size}x{target_size}")
+            return 'skipped'
+        
+        # 计算新尺寸，保持宽高比
+        ratio = target_size / max_original_dimension
+        new_width = int(original_size[0] * ratio)
+        new_height = int(original_size[1] * ratio)
+        
+        # 压缩图片（JPEG 先只解码到接近目标的分辨率）
+        draft_for_size(img, (new_width, new_height), quality)
+        with timed('resize', image_path):
+            resized_img = resize_image(img, (new_width, new_height), quality)
+
+    # 保存图片，保持原始格式
+    output_path = os.path.join(output_dir, filename)
+    try:
+        with timed('encode', image_path):
+            resized_img.save(output_path, image_format, **ENCODER_OPTIONS.get(image_format, {}))
+    finally:
+        resized_img.close()
+    logger.info(f"已压缩: {filename} ({original_size} -> {new_width}x{new_height})")
+    return 'ok'
+
+def compress_images(image_paths, target_size, progress_callback=None, quality=DEFAULT_RESIZE_QUALITY,
+                    jobs=None):
     """
-    压缩选中的图片到指定尺寸
+    压缩选中的图片到指定尺寸，结果保存在各图片所在目录的 compress_<target_size>/ 下
     参数:
         image_paths: 图片路径列表
         target_size: 目标尺寸 (256, 512, 或 1024)
+        progress_callback: 可选，接收 0-100 的进度
+        quality: 缩放质量，见 RESIZE_QUALITIES
+        jobs: 同时压缩的线程数（默认 CPU 核数）
+    返回 [(图片路径, 状态, 耗时秒数), ...]，状态为 'ok' / 'skipped' / 'error'。
     """
     if not image_paths:
-        return
-    
+        return []
+
+    # 创建输出目录（每个目录只建一次）
+    output_dirs = {}
     for image_path in image_paths:
+        src_dir = os.path.dirname(image_path)
+        if src_dir not in output_dirs:
+            output_dirs[src_dir] = os.path.join(src_dir, f"compress_{target_size}")
+            os.makedirs(output_dirs[src_dir], exist_ok=True)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    def compress_one(image_path):
+        raise_if_cancelled()
+        start = time.perf_counter()
         try:
-            # 获取源文件信息
-            src_dir = os.path.dirname(image_path)
-            filename = os.path.basename(image_path)
-            base_name, ext = os.path.splitext(filename)
-            
-            # 创建输出目录
-            output_dir = os.path.join(src_dir, f"compress_{target_size}")
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-            
-            # 打开并处理图片
-            with Image.open(image_path) as img:
-                # 如果是动图，只取第一帧
-                if hasattr(img, 'is_animated') and img.is_animated:
-                    img.seek(0)
-                
-                # 获取原始尺寸
-                original_size = img.size
-                max_original_dimension = max(original_size)
-                
-                # 如果图片尺寸小于目标尺寸，跳过
-                if max_original_dimension <= target_size:
-                    print(f"跳过 {filename}: 原始尺寸 {original_size} 小于目标尺寸 {target_size}x{target_size}")
-                    continue
-                
-                # 计算新尺寸，保持宽高比
-                ratio = target_size / max_original_dimension
-                new_width = int(original_size[0] * ratio)
-                new_height = int(original_size[1] * ratio)
-                
-                # 压缩图片
-                resized_img = img.resize((new_width, new_height), Resampling.LANCZOS)
-                
-                # 保存图片，保持原始格式
-                output_path = os.path.join(output_dir, filename)
-                resized_img.save(output_path, quality=95)
-                print(f"已压缩: {filename} ({original_size} -> {new_width}x{new_height})")
-                
+            status = compress_image(image_path, output_dirs[os.path.dirname(image_path)],
+                                    target_size, quality)
         except Exception as e:
-            print(f"处理文件 {filename} 时出错: {str(e)}")
-            continue
-    
-    messagebox.showinfo("完成", f"图片压缩完成！\n已保存到 compress_{target_size}/ 文件夹")
+            logger.error(f"处理文件 {os.path.basename(image_path)} 时出错: {str(e)}")
+            status = 'error'
+        return image_path, status, time.perf_counter() - start
 
-def show_compress_window():
+    results = []
+    with concurrent_futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(compress_one, image_path) for image_path in image_paths]
+        try:
+            for future in futures:
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(len(results) / len(futures) * 100)
+        except JobCancelled:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+def show_compress_window(job_runner):
     """
     显示压缩图片的弹窗界面
     """
@@ -801,11 +3167,25 @@ def show_compress_window():
     size_menu.config(width=8)
     size_menu.pack(side='left', padx=5)
     
+    # 缩放质量
+    quality_label = Label(
+        size_frame,
+        text="质量:",
+        foreground="white",
+        background="#2b2b2b"
+    )
+    quality_label.pack(side='left', padx=5)
+    
+    quality_var = tk.StringVar(value=DEFAULT_RESIZE_QUALITY)
+    quality_menu = tk.OptionMenu(size_frame, quality_var, *RESIZE_QUALITIES)
+    quality_menu.config(width=8)
+    quality_menu.pack(side='left', padx=5)
+    
     # 压缩按钮
     compress_button = tk.Button(
         compress_window,
         text="选择并压缩图片",
-        command=lambda: browse_and_compress_images(size_var),
+        command=lambda: browse_and_compress_images(size_var, job_runner, quality_var),
         width=20,
         height=2,
         bg="#4a4a4a",
@@ -833,11 +3213,12 @@ def show_compress_window():
     )
     info_label.pack(pady=15)
 
-def browse_and_compress_images(size_var):
+def browse_and_compress_images(size_var, job_runner, quality_var=None):
     """
     打开文件选择对话框并压缩选中的图片
     """
     target_size = int(size_var.get())
+    quality = quality_var.get() if quality_var else DEFAULT_RESIZE_QUALITY
     image_paths = filedialog.askopenfilenames(
         filetypes=[
             ("Image Files", "*.bmp;*.jpg;*.jpeg;*.png;*.tif;*.tiff;*.gif;*.webp;*.psd;*.ico"),
@@ -855,9 +3236,17 @@ def browse_and_compress_images(size_var):
     )
     
     if image_paths:
-        compress_images(image_paths, target_size)
+        job_runner.submit(
+            compress_images,
+            image_paths,
+            target_size,
+            progress_callback=job_runner.report_progress,
+            quality=quality,
+            on_done=lambda _: messagebox.showinfo(
+                "完成", f"图片压缩完成！\n已保存到 compress_{target_size}/ 文件夹")
+        )
 
-def show_crop_window():
+def show_crop_window(job_runner):
     """
     显示裁剪图片的弹窗界面
     """
@@ -943,6 +3332,23 @@ def show_crop_window():
     
     size_var.trace('w', on_size_change)
     
+    # 裁剪框定位方式
+    anchor_frame = Frame(control_frame)
+    anchor_frame.pack(pady=5)
+    
+    anchor_label = Label(
+        anchor_frame,
+        text="定位方式:",
+        foreground="white",
+        background="#2b2b2b"
+    )
+    anchor_label.pack(side='top', pady=2)
+    
+    anchor_var = tk.StringVar(value=DEFAULT_CROP_ANCHOR)
+    anchor_menu = tk.OptionMenu(anchor_frame, anchor_var, *CROP_ANCHORS)
+    anchor_menu.config(width=8)
+    anchor_menu.pack(side='top', pady=2)
+    
     # 图片预览区域
     preview_frame = Frame(crop_window)
     preview_frame.pack(side='right', expand=True, fill='both', padx=10, pady=10)
@@ -971,8 +3377,7 @@ def show_crop_window():
                                 int(size_var.get()) if size_var.get() != "自定义" else int(custom_size_entry.get()),
                                 preview_canvas)
                 current_preview["path"] = files[0]
-                with Image.open(files[0]) as img:
-                    current_preview["size"] = img.size
+                current_preview["size"] = preview_cache.get(files[0])[1]
     
     def select_preview():
         preview = filedialog.askopenfilename(
@@ -989,8 +3394,7 @@ def show_crop_window():
                             int(size_var.get()) if size_var.get() != "自定义" else int(custom_size_entry.get()),
                             preview_canvas)
             current_preview["path"] = preview
-            with Image.open(preview) as img:
-                current_preview["size"] = img.size
+            current_preview["size"] = preview_cache.get(preview)[1]
     
     def start_crop():
         if not selected_files:
@@ -1018,18 +3422,32 @@ def show_crop_window():
                 else:
                     different_size_images.append(file_path)
         
+        crop_size = int(size_var.get()) if size_var.get() != "自定义" else int(custom_size_entry.get())
+        canvas_size = (preview_canvas.winfo_width(), preview_canvas.winfo_height())
+
         # 处理相同尺寸的图片
-        process_crop(same_size_images, crop_box, 
-                    int(size_var.get()) if size_var.get() != "自定义" else int(custom_size_entry.get()),
-                    preview_canvas)
+        groups = [same_size_images]
         
         # 如果有不同尺寸的图片，询问用户
         if different_size_images:
             if messagebox.askyesno("提示", 
                                  f"发现{len(different_size_images)}张图片尺寸与示例图片不同。\n是否也要裁剪这些图片？"):
-                process_crop(different_size_images, crop_box,
-                           int(size_var.get()) if size_var.get() != "自定义" else int(custom_size_entry.get()),
-                           preview_canvas)
+                groups.append(different_size_images)
+
+        # 画布坐标 -> 图片相对位置的换算需要读取画布尺寸，只能在主线程完成
+        center = compute_crop_center(current_preview["size"], crop_box, crop_size, canvas_size)
+        file_paths = [file_path for group in groups for file_path in group]
+
+        job_runner.submit(
+            process_crop,
+            file_paths,
+            center,
+            crop_size,
+            progress_callback=job_runner.report_progress,
+            anchor=anchor_var.get(),
+            on_done=lambda _: messagebox.showinfo(
+                "完成", f"图片裁剪完成！\n已保存到 crop_{crop_size}/ 文件夹")
+        )
     
     # 按钮区域
     button_frame = Frame(control_frame)
@@ -1065,200 +3483,394 @@ def show_crop_window():
     )
     start_crop_btn.pack(pady=5)
 
+# 裁剪预览用的低分辨率代理图：每个文件只解码缩小一次，之后切换尺寸、重绘都用代理图
+PREVIEW_PROXY_SIZE = 1024
+PREVIEW_CACHE_SIZE = 8
+
+class PreviewCache:
+    """
+    按最近使用淘汰的代理图缓存：路径 -> (修改时间, 代理图, 原图尺寸)。
+    文件被修改后重新生成；超过 max_items 张时关闭最久没用的代理图。
+    """
+    def __init__(self, max_items=PREVIEW_CACHE_SIZE, proxy_size=PREVIEW_PROXY_SIZE):
+        self.max_items = max_items
+        self.proxy_size = proxy_size
+        self._items = {}
+
+    def get(self, image_path):
+        """
+        返回 (代理图, 原图尺寸)。
+        """
+        mtime = os.stat(image_path).st_mtime_ns
+        cached = self._items.pop(image_path, None)
+        if cached is None or cached[0] != mtime:
+            if cached is not None:
+                cached[1].close()
+            cached = (mtime,) + self._build_proxy(image_path)
+        # 重新插入到末尾，dict 的顺序即使用顺序
+        self._items[image_path] = cached
+        while len(self._items) > self.max_items:
+            oldest = next(iter(self._items))
+            self._items.pop(oldest)[1].close()
+        return cached[1], cached[2]
+
+    def _build_proxy(self, image_path):
+        with Image.open(image_path) as img:
+            # 如果是动图，只取第一帧
+            if hasattr(img, 'is_animated') and img.is_animated:
+                img.seek(0)
+            size = img.size
+            # thumbnail 会先 draft（JPEG 直接按缩小的分辨率解码），再 reduce() 后精细缩放
+            img.thumbnail((self.proxy_size, self.proxy_size), Image.Resampling.LANCZOS,
+                          reducing_gap=RESIZE_QUALITIES['fast'])
+            if img.mode in ('1', 'L', 'RGB', 'RGBA'):
+                proxy = img.copy()
+            else:
+                proxy = img.convert('RGBA')
+        return proxy, size
+
+    def clear(self):
+        for cached in self._items.values():
+            cached[1].close()
+        self._items.clear()
+
+preview_cache = PreviewCache()
+
 def show_crop_preview(image_path, crop_size, canvas):
     """
-    显示预览图片和可拖动的裁剪框
+    显示预览图片和可拖动的裁剪框。
+    同一张图、画布大小不变时（例如只改了裁剪尺寸）只调整裁剪框，不重绘图片；
+    需要重绘时从缓存的代理图缩放，并尽量复用画布上已有的 PhotoImage。
+    """
+    state = getattr(canvas, 'preview_state', None)
+    if state is None:
+        state = canvas.preview_state = _init_crop_canvas(canvas)
+
+    canvas_width = canvas.winfo_width()
+    canvas_height = canvas.winfo_height()
+    proxy, (image_width, image_height) = preview_cache.get(image_path)
+
+    # 计算缩放比例（与 compute_crop_center 一致，按原图尺寸计算）
+    scale = min(canvas_width/image_width, canvas_height/image_height)
+    preview_width = max(1, int(image_width * scale))
+    preview_height = max(1, int(image_height * scale))
+    preview_x = canvas_width//2 - preview_width//2
+    preview_y = canvas_height//2 - preview_height//2
+
+    view = (image_path, canvas_width, canvas_height)
+    if view != state["view"]:
+        preview_img = resize_image(proxy, (preview_width, preview_height))
+        photo = state["photo"]
+        if photo is not None and (photo.width(), photo.height()) == preview_img.size:
+            photo.paste(preview_img)
+        else:
+            photo = ImageTk.PhotoImage(image=preview_img)
+            state["photo"] = canvas.image = photo
+        preview_img.close()
+
+        # 显示图片
+        canvas.coords("preview", canvas_width//2, canvas_height//2)
+        canvas.itemconfigure("preview", image=photo)
+        # 换了图片时裁剪框回到左上角
+        box_x, box_y = preview_x, preview_y
+    else:
+        # 只改尺寸时保持裁剪框左上角不动
+        box_x, box_y = canvas.coords("crop_box")[:2]
+
+    state["view"] = view
+    state["bounds"] = (preview_x, preview_y, preview_x + preview_width, preview_y + preview_height)
+
+    # 实际尺寸的裁剪框，尽量留在预览图片范围内
+    crop_box_size = int(crop_size * scale)
+    box_x = max(preview_x, min(box_x, preview_x + preview_width - crop_box_size))
+    box_y = max(preview_y, min(box_y, preview_y + preview_height - crop_box_size))
+    _place_crop_box(canvas, box_x, box_y, crop_box_size)
+
+def _place_crop_box(canvas, x, y, box_size):
+    drag_padding = 15
+    canvas.coords("drag_area",
+                  x - drag_padding, y - drag_padding,
+                  x + box_size + drag_padding, y + box_size + drag_padding)
+    canvas.coords("crop_box", x, y, x + box_size, y + box_size)
+
+def _init_crop_canvas(canvas):
+    """
+    创建预览图片、裁剪框、拖动区域这几个画布元素并绑定拖动事件，每个画布只做一次。
+    拖动时只移动裁剪框，不碰预览图片。
     """
     canvas.delete("all")
+    state = {"view": None, "photo": None, "bounds": (0, 0, 0, 0)}
+
+    canvas.create_image(0, 0, anchor='center', tags="preview")
+    # 拖动区域比裁剪框大一圈，方便点中
+    canvas.create_rectangle(0, 0, 0, 0, fill='', outline='', tags="drag_area")
+    canvas.create_rectangle(0, 0, 0, 0, outline='red', width=2, tags="crop_box")
+
+    # 拖动相关变量
+    drag_data = {"x": 0, "y": 0, "dragging": False}
+
+    def start_drag(event):
+        # 记录起始位置
+        drag_data["x"] = event.x
+        drag_data["y"] = event.y
+        drag_data["dragging"] = True
+
+    def drag(event):
+        if not drag_data["dragging"]:
+            return
+
+        # 计算移动距离
+        dx = event.x - drag_data["x"]
+        dy = event.y - drag_data["y"]
+
+        # 获取当前裁剪框位置
+        box_coords = canvas.coords("crop_box")
+        new_x1 = box_coords[0] + dx
+        new_y1 = box_coords[1] + dy
+        new_x2 = box_coords[2] + dx
+        new_y2 = box_coords[3] + dy
+
+        # 预览图片的边界
+        preview_x, preview_y, preview_right, preview_bottom = state["bounds"]
+
+        # 调整到有效范围内
+        if new_x1 < preview_x:
+            dx = preview_x - box_coords[0]
+        elif new_x2 > preview_right:
+            dx = preview_right - box_coords[2]
+
+        if new_y1 < preview_y:
+            dy = preview_y - box_coords[1]
+        elif new_y2 > preview_bottom:
+            dy = preview_bottom - box_coords[3]
+
+        # 移动裁剪框和拖动区域
+        if dx != 0 or dy != 0:
+            canvas.move("crop_box", dx, dy)
+            canvas.move("drag_area", dx, dy)
+
+        # 更新起始位置
+        drag_data["x"] = event.x
+        drag_data["y"] = event.y
+
+    def stop_drag(event):
+        drag_data["dragging"] = False
+
+    # 绑定拖动事件到拖动区域
+    canvas.tag_bind("drag_area", '<Button-1>', start_drag)
+    canvas.tag_bind("drag_area", '<B1-Motion>', drag)
+    canvas.tag_bind("drag_area", '<ButtonRelease-1>', stop_drag)
+
+    # 改变鼠标样式
+    def on_enter(event):
+        canvas.configure(cursor="hand2")  # 或者使用 "fleur" 获得十字光标
+
+    def on_leave(event):
+        canvas.configure(cursor="")
+
+    canvas.tag_bind("drag_area", '<Enter>', on_enter)
+    canvas.tag_bind("drag_area", '<Leave>', on_leave)
+    return state
+
+# 裁剪框在每张图片上的定位方式
+#   box：按示例图片上裁剪框中心的相对位置（尺寸不同的图片按比例对应）
+#   center：图片正中
+#   content：内容（与背景明显不同的部分）外接矩形的中心，适合扫描的印章等位置不固定的图片
+CROP_ANCHORS = ('box', 'center', 'content')
+DEFAULT_CROP_ANCHOR = 'box'
+# 亮度（或不透明度）与背景相差超过此值的像素算作内容
+CONTENT_THRESHOLD = 32
+
+def compute_crop_center(image_size, crop_coords, crop_size, canvas_size):
+    """
+    把画布上的裁剪框换算为示例图片（尺寸 image_size）上裁剪区域中心的相对位置 (0~1, 0~1)。
+    只在主线程算一次，之后每张图片按自己的尺寸用 place_crop_box 定位。
+    """
+    image_width, image_height = image_size
+    # 计算画布上的缩放比例
+    canvas_width, canvas_height = canvas_size
+    scale = min(canvas_width/image_width, canvas_height/image_height)
     
-    with Image.open(image_path) as img:
-        canvas_width = canvas.winfo_width()
-        canvas_height = canvas.winfo_height()
-        
-        # 计算缩放比例
-        scale = min(canvas_width/img.width, canvas_height/img.height)
-        preview_width = int(img.width * scale)
-        preview_height = int(img.height * scale)
-        
-        preview_img = img.resize((preview_width, preview_height), Resampling.LANCZOS)
-        preview_photo = PhotoImage(image=preview_img)
-        canvas.image = preview_photo
-        
-        # 显示图片
-        preview_x = canvas_width//2 - preview_width//2
-        preview_y = canvas_height//2 - preview_height//2
-        canvas.create_image(
-            canvas_width//2,
-            canvas_height//2,
-            image=preview_photo,
-            anchor='center',
-            tags="preview"
-        )
-        
-        # 创建实际尺寸的裁剪框
-        crop_box_size = int(crop_size * scale)
-        initial_x = preview_x
-        initial_y = preview_y
-        
-        # 创建裁剪框和拖动区域
-        drag_padding = 15
-        canvas.create_rectangle(
-            initial_x - drag_padding, 
-            initial_y - drag_padding,
-            initial_x + crop_box_size + drag_padding,
-            initial_y + crop_box_size + drag_padding,
-            fill='',
-            outline='',
-            tags="drag_area"
-        )
-        
-        canvas.create_rectangle(
-            initial_x, initial_y,
-            initial_x + crop_box_size,
-            initial_y + crop_box_size,
-            outline='red',
-            width=2,
-            tags="crop_box"
-        )
-        
-        # 拖动相关变量
-        drag_data = {"x": 0, "y": 0, "dragging": False}
-        
-        def start_drag(event):
-            # 记录起始位置
-            drag_data["x"] = event.x
-            drag_data["y"] = event.y
-            drag_data["dragging"] = True
-            
-        def drag(event):
-            if not drag_data["dragging"]:
-                return
-                
-            # 计算移动距离
-            dx = event.x - drag_data["x"]
-            dy = event.y - drag_data["y"]
-            
-            # 获取当前裁剪框位置
-            box_coords = canvas.coords("crop_box")
-            new_x1 = box_coords[0] + dx
-            new_y1 = box_coords[1] + dy
-            new_x2 = box_coords[2] + dx
-            new_y2 = box_coords[3] + dy
-            
-            # 计算预览图片的边界
-            preview_x = canvas_width//2 - preview_width//2
-            preview_y = canvas_height//2 - preview_height//2
-            preview_right = preview_x + preview_width
-            preview_bottom = preview_y + preview_height
-            
-            # 调整到有效范围内
-            if new_x1 < preview_x:
-                dx = preview_x - box_coords[0]
-            elif new_x2 > preview_right:
-                dx = preview_right - box_coords[2]
-            
-            if new_y1 < preview_y:
-                dy = preview_y - box_coords[1]
-            elif new_y2 > preview_bottom:
-                dy = preview_bottom - box_coords[3]
-            
-            # 移动裁剪框和拖动区域
-            if dx != 0 or dy != 0:
-                canvas.move("crop_box", dx, dy)
-                canvas.move("drag_area", dx, dy)
-            
-            # 更新起始位置
-            drag_data["x"] = event.x
-            drag_data["y"] = event.y
-        
-        def stop_drag(event):
-            drag_data["dragging"] = False
-        
-        # 绑定拖动事件到拖动区域
-        canvas.tag_bind("drag_area", '<Button-1>', start_drag)
-        canvas.tag_bind("drag_area", '<B1-Motion>', drag)
-        canvas.tag_bind("drag_area", '<ButtonRelease-1>', stop_drag)
-        
-        # 改变鼠标样式
-        def on_enter(event):
-            canvas.configure(cursor="hand2")  # 或者使用 "fleur" 获得十字光标
-            
-        def on_leave(event):
-            canvas.configure(cursor="")
-            
-        canvas.tag_bind("drag_area", '<Enter>', on_enter)
-        canvas.tag_bind("drag_area", '<Leave>', on_leave)
+    # 计算预览图片在画布上的偏移量
+    preview_width = int(image_width * scale)
+    preview_height = int(image_height * scale)
+    offset_x = (canvas_width - preview_width) // 2
+    offset_y = (canvas_height - preview_height) // 2
+    
+    # 将画布坐标转换为原始图片坐标，再换算为相对位置
+    center_x = (crop_coords[0] - offset_x) / scale + crop_size / 2
+    center_y = (crop_coords[1] - offset_y) / scale + crop_size / 2
+    return (center_x / image_width, center_y / image_height)
+
+def find_content_bbox(img, threshold=CONTENT_THRESHOLD):
+    """
+    返回内容的外接矩形 (left, top, right, bottom)，整张图都是背景时返回 None。
+    有透明通道时按不透明的部分；否则用 should_invert_image 判断白底还是黑底，与背景亮度相差大的算内容。
+    大图先按整数倍缩小到 512 左右再找，结果换算回原图坐标。
+    """
+    if 'A' in img.getbands() or 'transparency' in img.info:
+        mask = img.convert('RGBA').getchannel('A')
+        white_background = False
+    else:
+        mask = img if img.mode == 'L' else img.convert('L')
+        white_background = should_invert_image(mask)
+
+    factor = max(1, max(img.size) // 512)
+    if factor > 1:
+        mask = mask.reduce(factor)
+    if white_background:
+        table = [255 if v < 255 - threshold else 0 for v in range(256)]
+    else:
+        table = [255 if v > threshold else 0 for v in range(256)]
+    bbox = mask.point(table).getbbox()
+    if bbox is None:
+        return None
+    left, top, right, bottom = bbox
+    return (left * factor, top * factor,
+            min(right * factor, img.width), min(bottom * factor, img.height))
+
+def place_crop_box(image_size, crop_size, center):
+    """
+    以 center（原图像素坐标）为中心放一个 crop_size 见方的裁剪框，超出图片时移回图片内；
+    图片比裁剪框小的方向上居中，多出的部分由 crop() 补黑边（透明图补透明）。
+    返回 (裁剪区域, 状态)，状态为 'ok' / 'clamped'（移动过）/ 'padded'（补了边）。
+    """
+    box = []
+    status = 'ok'
+    for length, wanted in zip(image_size, center):
+        start = round(wanted - crop_size / 2)
+        if length < crop_size:
+            start = -((crop_size - length) // 2)
+            status = 'padded'
+        elif start < 0 or start + crop_size > length:
+            start = min(max(start, 0), length - crop_size)
+            if status == 'ok':
+                status = 'clamped'
+        box.append(start)
+    left, top = box
+    return (left, top, left + crop_size, top + crop_size), status
+
+def crop_image(file_path, output_dir, crop_size, center=(0.5, 0.5), anchor=DEFAULT_CROP_ANCHOR):
+    """
+    裁剪一张图片并以同名保存到 output_dir，返回 place_crop_box 的状态。
+    center 为 anchor='box' 时使用的相对位置（见 compute_crop_center）。
+    """
+    with Image.open(file_path) as img:
+        # 如果是动图，只取第一帧
+        if hasattr(img, 'is_animated') and img.is_animated:
+            img.seek(0)
+
+        if anchor == 'box':
+            pixel_center = (center[0] * img.width, center[1] * img.height)
+        elif anchor == 'center':
+            pixel_center = (img.width / 2, img.height / 2)
+        elif anchor == 'content':
+            bbox = find_content_bbox(img)
+            if bbox is None:
+                pixel_center = (img.width / 2, img.height / 2)
+            else:
+                pixel_center = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+        else:
+            raise ValueError(f"未知的裁剪定位方式: {anchor}")
+
+        crop_box, status = place_crop_box(img.size, crop_size, pixel_center)
+        cropped = img.crop(crop_box)
 
-def process_crop(file_paths, crop_coords, crop_size, preview_canvas):
+    # 保存裁剪后的图片
+    output_path = os.path.join(output_dir, os.path.basename(file_path))
+    try:
+        cropped.save(output_path, quality=95)
+    finally:
+        cropped.close()
+    return status
+
+def process_crop(file_paths, center, crop_size, progress_callback=None, anchor=DEFAULT_CROP_ANCHOR,
+                 jobs=None):
     """
-    根据指定的裁剪区域处理所有图片
+    把所有图片裁剪为 crop_size 见方，保存到第一张图片所在目录的 crop_<crop_size>/ 下。
+    裁剪框按 anchor（见 CROP_ANCHORS）在每张图片上单独定位，超出范围时移回图片内，
+    图片比裁剪框小时补边，不会跳过任何图片。
+    jobs 为同时裁剪的线程数（默认 CPU 核数）。
+    返回 [(文件路径, 状态, 耗时秒数), ...]，状态为 place_crop_box 的状态或 'error'。
     """
     if not file_paths:
-        return
+        return []
         
     # 创建输出目录
     first_file_dir = os.path.dirname(file_paths[0])
     output_dir = os.path.join(first_file_dir, f'crop_{crop_size}')
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    
-    # 获取预览图片的信息
-    with Image.open(file_paths[0]) as img:
-        # 计算画布上的缩放比例
-        canvas_width = preview_canvas.winfo_width()
-        canvas_height = preview_canvas.winfo_height()
-        scale = min(canvas_width/img.width, canvas_height/img.height)
-        
-        # 计算预览图片在画布上的偏移量
-        preview_width = int(img.width * scale)
-        preview_height = int(img.height * scale)
-        offset_x = (canvas_width - preview_width) // 2
-        offset_y = (canvas_height - preview_height) // 2
-        
-        # 将画布坐标转换为原始图片坐标
-        relative_x = int((crop_coords[0] - offset_x) / scale)
-        relative_y = int((crop_coords[1] - offset_y) / scale)
-        
-        # 使用指定尺寸创建裁剪框
-        crop_box = (
-            relative_x,
-            relative_y,
-            relative_x + crop_size,
-            relative_y + crop_size
-        )
-    
-    # 处理所有图片
-    for file_path in file_paths:
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    def crop_one(file_path):
+        raise_if_cancelled()
+        start = time.perf_counter()
         try:
-            with Image.open(file_path) as img:
-                # 如果是动图，只取第一帧
-                if hasattr(img, 'is_animated') and img.is_animated:
-                    img.seek(0)
-                
-                # 检查裁剪区域是否超出图片范围
-                if (crop_box[2] > img.width or crop_box[3] > img.height):
-                    print(f"跳过 {os.path.basename(file_path)}: 裁剪区域超出图片范围")
-                    continue
-                
-                # 直接裁剪指定区域
-                cropped = img.crop(crop_box)
-                
-                # 保存裁剪后的图片
-                output_path = os.path.join(output_dir, os.path.basename(file_path))
-                cropped.save(output_path, quality=95)
-                print(f"已裁剪: {os.path.basename(file_path)}")
-                
+            with timed('crop', file_path):
+                status = crop_image(file_path, output_dir, crop_size, center, anchor)
         except Exception as e:
-            print(f"处理 {os.path.basename(file_path)} 时出错: {str(e)}")
-            continue
-    
-    # 显示成功信息
-    messagebox.showinfo("完成", f"图片裁剪完成！\n已保存到 crop_{crop_size}/ 文件夹")
+            logger.error(f"处理 {os.path.basename(file_path)} 时出错: {str(e)}")
+            status = 'error'
+        else:
+            if status == 'padded':
+                logger.info(f"已裁剪（图片小于裁剪尺寸，已补边）: {os.path.basename(file_path)}")
+            elif status == 'clamped':
+                logger.info(f"已裁剪（裁剪框超出图片，已移回图片内）: {os.path.basename(file_path)}")
+            else:
+                logger.info(f"已裁剪: {os.path.basename(file_path)}")
+        return file_path, status, time.perf_counter() - start
 
-if __name__ == "__main__":
+    results = []
+    with concurrent_futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(crop_one, file_path) for file_path in file_paths]
+        try:
+            for future in futures:
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(len(results) / len(futures) * 100)
+        except JobCancelled:
+            for future in futures:
+                future.cancel()
+            raise
+
+    counts = {}
+    for _, status, _ in results:
+        counts[status] = counts.get(status, 0) + 1
+    logger.info(f"裁剪完成：共 {len(results)} 张，正常 {counts.get('ok', 0)}，"
+                f"移回图片内 {counts.get('clamped', 0)}，补边 {counts.get('padded', 0)}，"
+                f"失败 {counts.get('error', 0)}")
+    return results
+
+def load_gui_modules():
+    """
+    导入界面需要的 tkinter。
+    命令行模式不会调用这里，因此启动更快，也不要求系统装有 Tk。
+    ImageTk 会连带导入 PIL，留到裁剪预览时再导入。
+    """
+    global tk, filedialog, messagebox, Button, Label, Frame, Progressbar
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+    from tkinter.ttk import Button, Label, Frame, Progressbar
+
+# 窗口显示之后在后台线程中预先导入，第一次点击按钮时不用再等
+PREWARM_MODULES = ('PIL.Image', 'zipfile', 'plistlib', 'json', 'concurrent.futures')
+
+def prewarm_modules():
+    def load():
+        for name in PREWARM_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.debug(f"预先导入 {name} 失败: {e}")
+    threading.Thread(target=load, daemon=True).start()
+
+def run_gui():
+    load_gui_modules()
     root = tk.Tk()
     root.title("Procreate 笔刷工具箱")
-    root.geometry("600x720")  # 设置窗口大小
+    root.geometry("600x780")  # 设置窗口大小
     root.configure(bg="#2b2b2b")
 
     frame = Frame(root, style="TFrame")
@@ -1291,6 +3903,7 @@ if __name__ == "__main__":
         frame,
         text=("1) 解析笔刷文件：选择.brushset文件，提取PNG、JPG、JPEG到 cache/ 与 texture_shape/\n"
               "2) 图像转BMP和INI：多次选文件夹，将各种图片格式(PNG/JPG/TIFF等)转换为BMP并赋予.ini\n"
+              "   笔刷一键转BMP和INI：选择.brushset文件，直接生成 texture_shape/<笔刷名>/bmp/\n"
               "3) 手动反相处理：多选图像文件，对每张图片执行反相处理\n"
               "4) 智能反相处理：多选图像文件，自动检测白底图片并执行反相处理\n"
               "5) 打开程序目录：快速打开程序所在的文件夹\n\n"
@@ -1318,6 +3931,22 @@ if __name__ == "__main__":
     progress_bar = Progressbar(frame, orient="horizontal", length=500, mode="determinate")
     progress_bar.pack(pady=10)
 
+    # 显示后台任务最新的一行日志
+    status_label = Label(
+        frame,
+        text="",
+        foreground="white",
+        background="#2b2b2b",
+        font=("Helvetica", 9),
+        width=70
+    )
+    status_label.pack(pady=2)
+
+    job_runner = JobRunner(root, progress_label, progress_bar, status_label)
+
+    cancel_button = Button(frame, text="取消任务", command=job_runner.cancel)
+    cancel_button.pack(pady=5)
+
     # 创建左右两列的容器
     columns_frame = Frame(frame)
     columns_frame.pack(expand=True, fill='both', padx=10)
@@ -1340,16 +3969,19 @@ if __name__ == "__main__":
     )
     brush_label.pack(pady=10)
     # 将按钮放入左列
-    parse_button = Button(left_column, text="解析笔刷文件", command=lambda: browse_brushset(progress_label, progress_bar))
+    parse_button = Button(left_column, text="解析笔刷文件", command=lambda: browse_brushset(job_runner))
     parse_button.pack(pady=8, fill='x')
 
-    convert_button = Button(left_column, text="图像转BMP和INI", command=browse_folders_for_bmp_and_ini)
+    convert_button = Button(left_column, text="图像转BMP和INI", command=lambda: browse_folders_for_bmp_and_ini(job_runner))
     convert_button.pack(pady=8, fill='x')
 
-    invert_button = Button(left_column, text="手动反相处理", command=lambda: invert_selected_image_files(auto_detect=False))
+    one_step_button = Button(left_column, text="笔刷一键转BMP和INI", command=lambda: browse_brushset_to_sai(job_runner))
+    one_step_button.pack(pady=8, fill='x')
+
+    invert_button = Button(left_column, text="手动反相处理", command=lambda: invert_selected_image_files(job_runner, auto_detect=False))
     invert_button.pack(pady=8, fill='x')
 
-    auto_invert_button = Button(left_column, text="智能反相处理", command=lambda: invert_selected_image_files(auto_detect=True))
+    auto_invert_button = Button(left_column, text="智能反相处理", command=lambda: invert_selected_image_files(job_runner, auto_detect=True))
     auto_invert_button.pack(pady=8, fill='x')
 
     open_dir_button = Button(left_column, text="打开程序目录", command=open_current_directory)
@@ -1369,12 +4001,22 @@ if __name__ == "__main__":
     compress_button = Button(
         right_column,
         text="压缩图片",
-        command=show_compress_window
+        command=lambda: show_compress_window(job_runner)
     )
     compress_button.pack(pady=8, fill='x')
 
     # 添加裁剪按钮
-    crop_button = Button(right_column, text="裁剪图片", command=show_crop_window)
+    crop_button = Button(right_column, text="裁剪图片", command=lambda: show_crop_window(job_runner))
     crop_button.pack(pady=8, fill='x')
 
+    root.after(100, prewarm_modules)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    # 打包成 exe 后子进程需要这一行才能正常启动（未打包时它什么也不做，不必导入 multiprocessing）
+    if getattr(sys, 'frozen', False):
+        multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(cli_main(sys.argv[1:]))
+    run_gui()
@@ -0,0 +1,78 @@
+"""
+让测试可以直接 import prct2sai_v7（程序是单文件脚本，没有安装成包），并提供共用的 fixture。
+"""
+import io
+import logging
+import os
+import random
+import sys
+import zipfile
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 默认不使用白底判断的缓存，测试不会在程序目录下留下 cache/invert_verdicts.db
+os.environ.setdefault('PRCT2SAI_VERDICT_CACHE', 'off')
+
+import benchmark
+import prct2sai_v7 as prct2sai
+
+
+def png_bytes(value, size=(64, 64)):
+    buffer = io.BytesIO()
+    Image.new('L', size, value).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    在临时目录中运行（解析器使用相对路径 cache/ 与 texture_shape/），白底判断的缓存也放在这里。
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(prct2sai, 'invert_verdicts',
+                        prct2sai.VerdictCache(str(tmp_path / 'cache' / 'invert_verdicts.db')))
+    return tmp_path
+
+
+@pytest.fixture
+def make_brushset():
+    """
+    make_brushset(路径, {笔刷目录: {文件名: 内容}}, {其他文件: 内容}) 写出一个 .brushset，
+    每个笔刷目录都会带上一个合成的 Brush.archive。
+    """
+    def make(path, brushes, extra=None):
+        rng = random.Random(0)
+        with zipfile.ZipFile(path, 'w') as archive:
+            for brush_dir, files in brushes.items():
+                archive.writestr(f'{brush_dir}/Brush.archive', benchmark.make_brush_archive(brush_dir, rng))
+                for name, data in files.items():
+                    archive.writestr(f'{brush_dir}/{name}', data)
+            for name, data in (extra or {}).items():
+                archive.writestr(name, data)
+        # 同一秒内重写时修改时间可能不变，手动往后调，保证能看出压缩包变了
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9 * random.randint(1, 10 ** 6)))
+        return path
+    return make
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def log_messages():
+    """
+    收集 prct2sai 的日志（它不向 root logger 传播，caplog 收不到）。
+    """
+    handler = _ListHandler()
+    prct2sai.logger.addHandler(handler)
+    yield handler.messages
+    prct2sai.logger.removeHandler(handler)
@@ -0,0 +1,31 @@
+"""
+取消任务：进程池里正在运行的任务也能收到取消标记，不用等整个压缩包处理完。
+"""
+import threading
+import time
+
+import pytest
+
+import prct2sai_v7 as prct2sai
+
+JOB_SECONDS = 10
+
+
+def slow_job(filename, progress_queue):
+    # 模拟逐个处理成员的任务，每个成员之前检查一次取消标记
+    deadline = time.monotonic() + JOB_SECONDS
+    while time.monotonic() < deadline:
+        prct2sai.raise_if_cancelled()
+        time.sleep(0.05)
+    return None
+
+
+def test_cancel_interrupts_running_workers(monkeypatch):
+    cancel = threading.Event()
+    monkeypatch.setattr(prct2sai, '_cancel_event', cancel)
+    threading.Timer(1.0, cancel.set).start()
+
+    start = time.monotonic()
+    with pytest.raises(prct2sai.JobCancelled):
+        prct2sai.run_brushset_jobs(slow_job, ['a.brushset', 'b.brushset'], max_workers=2)
+    assert time.monotonic() - start < JOB_SECONDS / 2
@@ -0,0 +1,94 @@
+"""
+命令行子命令：convert / parse / index / search / bmp / invert，以及 --verdict-cache。
+"""
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+BRUSH = 'ABABABAB-0000-0000-0000-000000000001'
+
+
+@pytest.fixture
+def cli(workdir, monkeypatch):
+    # cli_main 会替换全局的内存预算和白底判断缓存，测试结束后恢复
+    monkeypatch.setattr(prct2sai, '_memory_budget', prct2sai._memory_budget)
+    monkeypatch.setattr(prct2sai, 'invert_verdicts', prct2sai.invert_verdicts)
+    # 日志文件写在这次测试的临时目录里，结束后摘掉
+    monkeypatch.setattr(prct2sai, '_file_handler', None)
+    yield prct2sai.cli_main
+    if prct2sai._file_handler is not None:
+        prct2sai.logger.removeHandler(prct2sai._file_handler)
+        prct2sai._file_handler.close()
+
+
+@pytest.fixture
+def sample(workdir, make_brushset):
+    return make_brushset(workdir / 'sample.brushset',
+                         {BRUSH: {'Shape.png': png_bytes(250), 'Grain.png': png_bytes(10, (300, 200))}})
+
+
+def test_convert_writes_bmps(cli, workdir, sample):
+    assert cli(['convert', str(sample), '--out', 'out', '--jobs', '1', '--size', '512']) == 0
+    bmp_dir = workdir / 'out' / 'sample' / 'bmp'
+    assert sorted(path.name for path in bmp_dir.glob('*.bmp')) == ['sample_g1.bmp', 'sample_s1.bmp']
+    with Image.open(bmp_dir / 'sample_g1.bmp') as img:
+        assert img.size == (256, 256)
+
+
+def test_convert_auto_invert_uses_the_given_cache(cli, workdir, sample):
+    assert cli(['--verdict-cache', 'verdicts.db', 'convert', str(sample), '--out', 'out',
+                '--jobs', '1', '--invert', 'auto']) == 0
+    assert (workdir / 'verdicts.db').exists()
+    with Image.open(workdir / 'out' / 'sample' / 'bmp' / 'sample_s1.bmp') as img:
+        assert img.getpixel((128, 128)) == 5
+
+
+def test_verdict_cache_off(cli, workdir, sample):
+    assert cli(['--verdict-cache', 'off', 'convert', str(sample), '--out', 'out',
+                '--jobs', '1', '--invert', 'auto']) == 0
+    assert prct2sai.invert_verdicts.db_path is None
+    assert not list(workdir.glob('**/*.db'))
+
+
+def test_parse_index_and_search(cli, workdir, sample, capsys):
+    assert cli(['parse', str(sample), '--jobs', '1']) == 0
+    assert cli(['index']) == 0
+    capsys.readouterr()
+
+    assert cli(['search', '--kind', 'grain']) == 0
+    assert capsys.readouterr().out.split() == [os.path.join('.', 'texture_shape', 'sample', 'sample_g1.png')]
+    assert cli(['search', '--needs-invert', 'yes', '--json']) == 0
+    rows = json.loads(capsys.readouterr().out)
+    assert [os.path.basename(row['path']) for row in rows] == ['sample_s1.png']
+
+
+def test_search_without_index(cli, workdir, capsys):
+    assert cli(['search', '--root', str(workdir / 'nothing')]) == 1
+    assert '还没有材质索引' in capsys.readouterr().err
+
+
+def test_bmp_and_invert(cli, workdir):
+    folder = workdir / 'images'
+    folder.mkdir()
+    (folder / 'white.png').write_bytes(png_bytes(250, (256, 256)))
+    (folder / 'black.png').write_bytes(png_bytes(10, (256, 256)))
+
+    assert cli(['bmp', str(folder)]) == 0
+    assert sorted(path.name for path in (folder / 'bmp').glob('*.bmp')) == ['black.bmp', 'white.bmp']
+
+    assert cli(['invert', '--auto', str(folder / 'white.png'), str(folder / 'black.png')]) == 0
+    with Image.open(folder / 'auto_invert' / 'white.png') as img:
+        assert img.getpixel((0, 0)) == 5
+    # 黑底的图片原样保存
+    with Image.open(folder / 'auto_invert' / 'black.png') as img:
+        assert img.getpixel((0, 0)) == 10
+
+
+def test_unknown_command_is_rejected(cli):
+    with pytest.raises(SystemExit):
+        cli(['explode'])
@@ -0,0 +1,34 @@
+"""
+一键转换：解码后释放压缩数据，进度按去重后的材质数计算。
+"""
+import io
+
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+
+def test_progress_reaches_100_with_duplicates(workdir, make_brushset):
+    brushset = make_brushset(workdir / 'dup.brushset', {
+        'EEEEEEEE-0000-0000-0000-000000000001': {'Shape.png': png_bytes(10), 'Grain.png': png_bytes(20)},
+        'EEEEEEEE-0000-0000-0000-000000000002': {'Shape.png': png_bytes(10)},
+    })
+    progress = []
+    bmp_files = prct2sai.convert_brushset_to_sai(str(brushset), str(workdir / 'out'), 'missing.ini',
+                                                 progress_callback=progress.append)
+    assert len(bmp_files) == 2
+    assert progress == [50.0, 100.0, 100]
+
+
+def test_decode_closes_the_compressed_buffer(monkeypatch):
+    textures = [('a/Shape.png', png_bytes(10))]
+    buffers = []
+    original = io.BytesIO
+
+    def recording(*args):
+        buffers.append(original(*args))
+        return buffers[-1]
+
+    monkeypatch.setattr(prct2sai.io, 'BytesIO', recording)
+    for member, gray, needs_invert in prct2sai.decode_textures(textures):
+        assert gray.mode == 'L' and not needs_invert
+        assert len(buffers) == 1 and buffers[0].closed
@@ -0,0 +1,53 @@
+"""
+复制材质时，上次复制过、索引里有记录的文件沿用索引中的 SHA-1，不再重新计算。
+"""
+import json
+import os
+
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+
+def write_sources(source, contents):
+    paths = []
+    for name, value in contents.items():
+        path = source / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(png_bytes(value))
+        paths.append(str(path))
+    return paths
+
+
+def copy_and_count(monkeypatch, files, target):
+    hashed = []
+    original = prct2sai.file_content_key
+
+    def counting(file_path, use_hash=False):
+        hashed.append(os.path.basename(os.path.dirname(file_path)) + '/' + os.path.basename(file_path))
+        return original(file_path, use_hash)
+
+    monkeypatch.setattr(prct2sai, 'file_content_key', counting)
+    prct2sai.copy_files_to_new_folder(files, str(target), 'sample')
+    monkeypatch.setattr(prct2sai, 'file_content_key', original)
+    return hashed
+
+
+def test_unchanged_files_are_not_hashed_again(workdir, monkeypatch):
+    files = write_sources(workdir / 'src', {'a/Shape.png': 10, 'b/Shape.png': 20, 'c/Shape.png': 10})
+    target = workdir / 'texture_shape'
+    assert len(copy_and_count(monkeypatch, files, target)) == 3
+
+    assert copy_and_count(monkeypatch, files, target) == ['c/Shape.png']
+    with open(target / 'sample' / prct2sai.DUPLICATES_FILE_NAME, encoding='utf-8') as f:
+        assert json.load(f) == {files[2]: 'sample_s1.png'}
+
+
+def test_changed_file_is_hashed_again(workdir, monkeypatch):
+    files = write_sources(workdir / 'src', {'a/Shape.png': 10, 'b/Grain.png': 20})
+    target = workdir / 'texture_shape'
+    copy_and_count(monkeypatch, files, target)
+
+    write_sources(workdir / 'src', {'b/Grain.png': 30})
+    assert copy_and_count(monkeypatch, files, target) == ['b/Grain.png']
+    rows = prct2sai.search_textures(str(target), kind='grain')
+    assert [row['content_hash'] for row in rows] == [prct2sai.file_content_key(files[1], use_hash=True)[1]]
@@ -0,0 +1,55 @@
+"""
+尺寸规范：fit / pad / crop / stretch 四种方式的几何和输出尺寸。
+"""
+import pytest
+from PIL import Image
+
+import prct2sai_v7 as prct2sai
+
+
+@pytest.mark.parametrize('mode, size, max_size, resized, side', [
+    ('fit', (300, 200), 1024, (256, 171), 256),
+    ('fit', (2048, 1024), 1024, (1024, 512), 1024),
+    ('fit', (100, 100), 1024, (100, 100), 256),
+    ('pad', (300, 200), 1024, (300, 200), 512),
+    ('pad', (2048, 1024), 512, (512, 256), 512),
+    ('crop', (300, 200), 1024, (256, 200), 256),
+    ('crop', (2048, 1024), 1024, (1024, 1024), 1024),
+    ('stretch', (2048, 1024), 1024, (1024, 1024), None),
+    ('stretch', (300, 200), 1024, (300, 200), None),
+])
+def test_plan_normalization(mode, size, max_size, resized, side):
+    _, planned, planned_side = prct2sai.plan_normalization(size, max_size, mode)
+    assert (planned, planned_side) == (resized, side)
+
+
+def test_crop_keeps_the_center():
+    box, _, _ = prct2sai.plan_normalization((2048, 1024), 1024, 'crop')
+    assert box == (512, 0, 1536, 1024)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        prct2sai.plan_normalization((300, 200), 1024, 'zoom')
+
+
+@pytest.mark.parametrize('mode', ['fit', 'pad', 'crop'])
+def test_normalized_image_is_a_standard_square(mode):
+    img = Image.new('L', (300, 200), 255)
+    normalized = prct2sai.normalize_image(img, 'Shape.png', 1024, mode)
+    assert normalized.size in prct2sai.SUPPORTED_RESOLUTIONS
+    # 补出的边是黑色（SAI 中的透明），原图居中
+    width, height = normalized.size
+    assert normalized.getpixel((width // 2, height // 2)) == 255
+    assert normalized.getpixel((width // 2, 0)) == 0
+
+
+def test_standard_image_is_returned_unchanged():
+    img = Image.new('L', (512, 512), 128)
+    for mode in prct2sai.NORMALIZE_MODES:
+        assert prct2sai.normalize_image(img, 'Shape.png', 1024, mode) is img
+
+
+def test_stretch_leaves_non_standard_sizes_for_wrongsize():
+    img = Image.new('L', (300, 200), 128)
+    assert prct2sai.normalize_image(img, 'Shape.png', 1024, 'stretch').size == (300, 200)
@@ -0,0 +1,51 @@
+"""
+解析时内容相同的材质用硬链接共用一个文件，之后重新解析不能经共用的文件改坏其他成员。
+"""
+import os
+
+from PIL import Image
+
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+BRUSH_A = 'AAAAAAAA-0000-0000-0000-000000000001'
+BRUSH_B = 'BBBBBBBB-0000-0000-0000-000000000002'
+
+
+def pixel(path):
+    with Image.open(path) as img:
+        return img.getpixel((0, 0))
+
+
+def test_reparse_after_duplicate_changes(workdir, make_brushset):
+    brushset = make_brushset(workdir / 'dup.brushset', {BRUSH_A: {'Shape.png': png_bytes(100)},
+                                                         BRUSH_B: {'Shape.png': png_bytes(100)}})
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    cached_a = workdir / 'cache' / 'dup.brushset' / BRUSH_A / 'Shape.png'
+    cached_b = workdir / 'cache' / 'dup.brushset' / BRUSH_B / 'Shape.png'
+    assert pixel(cached_a) == pixel(cached_b) == 100
+
+    # 只改 B
+    make_brushset(brushset, {BRUSH_A: {'Shape.png': png_bytes(100)},
+                             BRUSH_B: {'Shape.png': png_bytes(200)}})
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    assert pixel(cached_a) == 100
+    assert pixel(cached_b) == 200
+    assert not os.path.samefile(cached_a, cached_b)
+    assert sorted(pixel(path) for path in (workdir / 'texture_shape' / 'dup').glob('*.png')) == [100, 200]
+
+
+def test_reparse_repairs_damaged_links(workdir, make_brushset):
+    brushset = make_brushset(workdir / 'dup.brushset', {BRUSH_A: {'Shape.png': png_bytes(100)},
+                                                         BRUSH_B: {'Shape.png': png_bytes(200)}})
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    cached_a = workdir / 'cache' / 'dup.brushset' / BRUSH_A / 'Shape.png'
+    cached_b = workdir / 'cache' / 'dup.brushset' / BRUSH_B / 'Shape.png'
+    # 模拟旧版本留下的缓存：两个内容不同的成员共用一个文件
+    os.remove(cached_a)
+    os.link(cached_b, cached_a)
+    os.utime(brushset)
+
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    assert pixel(cached_a) == 100
+    assert pixel(cached_b) == 200
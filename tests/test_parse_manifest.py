@@ -0,0 +1,55 @@
+"""
+解析清单：压缩包没变时整个跳过解压，只记录真正提取的成员。
+"""
+import json
+
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+BRUSH = 'CCCCCCCC-0000-0000-0000-000000000003'
+SKIP_MESSAGE = '笔刷文件未变化，跳过解压'
+
+
+def make_sample(workdir, make_brushset):
+    return make_brushset(workdir / 'sample.brushset',
+                         {BRUSH: {'Shape.png': png_bytes(10), 'Grain.PNG': png_bytes(20)}},
+                         {'brushset.plist': b'<plist/>', 'QuickLook/Thumbnail.png': png_bytes(30)})
+
+
+def test_second_parse_takes_fast_path(workdir, make_brushset, log_messages):
+    brushset = make_sample(workdir, make_brushset)
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    assert SKIP_MESSAGE not in ' '.join(log_messages)
+
+    log_messages.clear()
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    assert any(message.startswith(SKIP_MESSAGE) for message in log_messages)
+    assert not any(message.startswith('已提取图片') for message in log_messages)
+
+
+def test_manifest_lists_only_extracted_members(workdir, make_brushset):
+    brushset = make_sample(workdir, make_brushset)
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    manifest_path = workdir / 'cache' / 'sample.brushset' / prct2sai.PARSE_MANIFEST_NAME
+    with open(manifest_path, encoding='utf-8') as f:
+        members = json.load(f)['members']
+    assert sorted(members) == [f'{BRUSH}/Brush.archive', f'{BRUSH}/Grain.PNG', f'{BRUSH}/Shape.png']
+
+
+def test_archive_check_ignores_case():
+    assert prct2sai.is_brush_archive('x/Brush.archive')
+    assert prct2sai.is_brush_archive('x/Brush.ARCHIVE')
+    assert prct2sai.BrushsetParser.member_output_path('cache', 'x/Brush.Archive').endswith(
+        'Brush_resolved_params.json')
+
+
+def test_changed_archive_is_parsed_again(workdir, make_brushset, log_messages):
+    brushset = make_sample(workdir, make_brushset)
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    make_brushset(brushset, {BRUSH: {'Shape.png': png_bytes(11), 'Grain.PNG': png_bytes(20)}})
+
+    log_messages.clear()
+    prct2sai.BrushsetParser(str(brushset)).parse()
+    assert not any(message.startswith(SKIP_MESSAGE) for message in log_messages)
+    assert f'已提取图片: {BRUSH}/Shape.png' in log_messages
+    assert f'未变化，跳过: {BRUSH}/Grain.PNG' in log_messages
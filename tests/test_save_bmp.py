@@ -0,0 +1,43 @@
+"""
+save_bmp 直接写出的灰度 BMP 必须与 Pillow 的 BMP 编码器逐字节一致。
+"""
+import random
+
+import pytest
+from PIL import Image
+
+import prct2sai_v7 as prct2sai
+
+# 标准尺寸、宽度不是 4 的倍数（需要行补齐）、1 像素宽/高以及非正方形的情况
+SIZES = [(256, 256), (512, 512), (1024, 1024), (1, 1), (1, 7), (7, 1), (2, 3), (3, 5),
+         (255, 17), (257, 300), (1023, 2), (1810, 1254)]
+
+
+def random_gray_image(size, seed=0):
+    width, height = size
+    return Image.frombytes('L', size, random.Random(seed).randbytes(width * height))
+
+
+@pytest.mark.parametrize('size', SIZES, ids=lambda size: f'{size[0]}x{size[1]}')
+def test_gray_bmp_matches_pillow(tmp_path, size):
+    img = random_gray_image(size)
+    expected_path = tmp_path / 'pillow.bmp'
+    actual_path = tmp_path / 'direct.bmp'
+    img.save(expected_path, 'BMP')
+    prct2sai.save_bmp(img, str(actual_path))
+    assert actual_path.read_bytes() == expected_path.read_bytes()
+    with Image.open(actual_path) as reloaded:
+        assert reloaded.mode == 'L'
+        assert reloaded.tobytes() == img.tobytes()
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', '1', 'P'])
+def test_other_modes_fall_back_to_pillow(tmp_path, mode, monkeypatch):
+    img = random_gray_image((33, 9)).convert(mode)
+    expected_path = tmp_path / 'pillow.bmp'
+    actual_path = tmp_path / 'direct.bmp'
+    img.save(expected_path, 'BMP')
+    # 非 L 模式不应走直接写出的路径
+    monkeypatch.setattr(prct2sai, 'gray_bmp_header', lambda *args: pytest.fail('gray_bmp_header called'))
+    prct2sai.save_bmp(img, str(actual_path))
+    assert actual_path.read_bytes() == expected_path.read_bytes()
@@ -0,0 +1,34 @@
+"""
+耗时统计：不同压缩包里同名的成员分开累计，报告里带上压缩包名。
+"""
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+
+def test_same_member_in_two_archives_is_kept_apart():
+    timer = prct2sai.StageTimer()
+    with timer.archive('a.brushset'):
+        timer.add('decode', 2.0, 'UUID/Shape.png')
+    with timer.archive('b.brushset'):
+        timer.add('decode', 1.0, 'UUID/Shape.png')
+    timer.add('encode', 0.5, '/out/x/bmp/x_s1.bmp')
+
+    merged = prct2sai.StageTimer()
+    merged.merge(timer.snapshot())
+    slowest = merged.summary()['slowest_items']
+    assert [(entry['archive'], entry['item']) for entry in slowest] == [
+        ('a.brushset', 'UUID/Shape.png'), ('b.brushset', 'UUID/Shape.png'), (None, '/out/x/bmp/x_s1.bmp')]
+    assert [prct2sai._short_item_name(entry) for entry in slowest] == [
+        'a.brushset: UUID/Shape.png', 'b.brushset: UUID/Shape.png', 'bmp/x_s1.bmp']
+
+
+def test_jobs_record_items_under_their_archive(workdir, make_brushset, monkeypatch):
+    brush = 'DDDDDDDD-0000-0000-0000-000000000004'
+    for name, value in (('a', 10), ('b', 20)):
+        make_brushset(workdir / f'{name}.brushset', {brush: {'Shape.png': png_bytes(value)}})
+    monkeypatch.setattr(prct2sai, 'timings', prct2sai.StageTimer())
+    prct2sai.run_brushset_jobs(prct2sai._parse_brushset_job,
+                               [str(workdir / 'a.brushset'), str(workdir / 'b.brushset')], max_workers=1)
+    archives = {archive for archive, item in prct2sai.timings.items if item == f'{brush}/Shape.png'}
+    assert archives == {'a.brushset', 'b.brushset'}
+
@@ -0,0 +1,64 @@
+"""
+白底判断缓存：可以关闭、能读旧版本的库，一键转换和反相处理共用同一份结果。
+"""
+import contextlib
+import sqlite3
+
+import prct2sai_v7 as prct2sai
+from conftest import png_bytes
+
+
+def test_verdicts_survive_a_new_process(tmp_path):
+    db_path = str(tmp_path / 'verdicts.db')
+    cache = prct2sai.VerdictCache(db_path)
+    cache.put('abc', (True, False))
+    cache.flush()
+    assert prct2sai.VerdictCache(db_path).get('abc') == (True, False)
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    assert prct2sai.parse_verdict_cache_path('off') is None
+    assert prct2sai.parse_verdict_cache_path('') is None
+    cache = prct2sai.VerdictCache(None)
+    cache.put('abc', (True, False))
+    cache.flush()
+    assert cache.get('abc') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_old_database_is_migrated(tmp_path):
+    db_path = str(tmp_path / 'verdicts.db')
+    with contextlib.closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute('CREATE TABLE verdicts (content_hash TEXT PRIMARY KEY,'
+                     ' needs_invert INTEGER NOT NULL, version INTEGER NOT NULL)')
+        conn.execute("INSERT INTO verdicts VALUES ('old', 1, 2)")
+
+    cache = prct2sai.VerdictCache(db_path)
+    # 旧版本的结果不再使用
+    assert cache.get('old') is None
+    cache.put('new', (True, True))
+    cache.flush()
+    assert prct2sai.VerdictCache(db_path).get('new') == (True, True)
+
+
+def test_name_hint_only_breaks_ties():
+    assert prct2sai.apply_invert_hint((False, True), prefer_invert=True)
+    assert not prct2sai.apply_invert_hint((False, False), prefer_invert=True)
+    assert not prct2sai.apply_invert_hint((False, True), prefer_invert=False)
+
+
+def test_convert_and_invert_share_verdicts(workdir, make_brushset, monkeypatch):
+    white = png_bytes(250)
+    brushset = make_brushset(workdir / 'white.brushset',
+                             {'FFFFFFFF-0000-0000-0000-000000000001': {'Shape.png': white}})
+    prct2sai.convert_brushset_to_sai(str(brushset), str(workdir / 'out'), 'missing.ini', invert='auto')
+    with contextlib.closing(sqlite3.connect(prct2sai.invert_verdicts.db_path)) as conn:
+        assert conn.execute('SELECT needs_invert FROM verdicts').fetchall() == [(1,)]
+
+    def fail(img):
+        raise AssertionError('结果应来自缓存')
+
+    monkeypatch.setattr(prct2sai, 'classify_background', fail)
+    image_path = workdir / 'Shape.png'
+    image_path.write_bytes(white)
+    assert prct2sai.needs_invert_file(str(image_path))